@@ -0,0 +1,176 @@
+import pandas as pd
+import numpy as np
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from instrumentation import peak_rss_mb
+
+# --- Benchmark por etapas ---
+# Para cada escala genera datos sintéticos (synthetic.py) en su propio directorio y mide,
+# en un proceso nuevo, el tiempo y la memoria de cada etapa: lectura, limpieza, deflactor,
+# guardado, carga y las funciones de trade_volume, trade_pattern y eda.Frames.
+# Los resultados se guardan en JSON para comparar versiones.
+SCALES = [100_000, 1_000_000]
+WORKDIR = 'benchmark_data'
+OUTPUT = 'benchmark_results.json'
+
+TRADE_VOLUME = ['efta_trade_volume', 'main_partners_trade_volume', 'world_trade_volume',
+                'relative_world_trade_volume', 'efta_relative_trade_volume']
+TRADE_PATTERN = [f'{partners}_{hs}' for partners in ('world', 'efta', 'main_partners')
+                 for hs in ('sectors', 'industries', 'products')]
+
+
+def _rows(result) -> int:
+    if isinstance(result, pd.DataFrame):
+        return len(result)
+    if isinstance(result, (list, tuple)):
+        return sum(_rows(item) for item in result)
+    return None
+
+
+def measure(stage: str, func, *args, trace: bool = True, **kwargs) -> tuple:
+    """
+    Ejecuta func y devuelve (resultado, medición). peak_mb es el pico de tracemalloc
+    durante la etapa (memoria de Python y NumPy); rss_mb el pico del proceso al terminar.
+    """
+    if trace:
+        tracemalloc.reset_peak()
+    start, cpu = time.perf_counter(), time.process_time()
+    result = func(*args, **kwargs)
+    record = {
+        'stage': stage,
+        'seconds': round(time.perf_counter() - start, 4),
+        'cpu_seconds': round(time.process_time() - cpu, 4),
+        'peak_mb': round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 2) if trace else None,
+        'rss_mb': peak_rss_mb(),
+        'rows': _rows(result),
+    }
+    print(f"  {stage}: {record['seconds']} s, pico {record['peak_mb']} MB, filas {record['rows']}")
+    return result, record
+
+
+def run_scale(rows: int, workdir: str, seed: int = 0, trace: bool = True) -> dict:
+    """
+    Genera los datos de una escala en workdir y mide todas las etapas. Cambia el
+    directorio de trabajo a workdir: los módulos usan rutas relativas (raw_data/, Data_Processed/).
+    """
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+
+    import synthetic
+    started = time.perf_counter()
+    synthetic.generate(rows, '.', seed)
+    generation = round(time.perf_counter() - started, 2)
+
+    import storage
+    import create_csv
+    import clear_data
+    import inflation_deflator
+    import trade_volume
+    import trade_pattern
+    import eda
+
+    if trace:
+        tracemalloc.start()
+    records = []
+
+    def stage(name, func, *args, **kwargs):
+        result, record = measure(name, func, *args, trace=trace, **kwargs)
+        records.append(record)
+        return result
+
+    # Etapas del procesamiento
+    archivos = stage('ingest', lambda: create_csv.combine(create_csv.read_files(create_csv.list_raw_files())))
+    df_trade = stage('clean', clear_data.clean_trade, archivos)
+    del archivos
+    df_deflator = inflation_deflator.load_deflator()
+    df_trade = stage('deflate', inflation_deflator.deflate_trade, df_trade, df_deflator)
+    stage('save', storage.write_frame, df_trade, 'trade_deflated')
+    del df_trade
+
+    # Análisis (la primera etapa de cada módulo incluye la lectura de sus columnas)
+    stage('load', lambda: [trade_volume.trade_flow(), trade_pattern.hs_frame('SECTORS'), eda.load_data()])
+    for name in TRADE_VOLUME:
+        stage(f'trade_volume.{name}', getattr(trade_volume, name))
+    for name in TRADE_PATTERN:
+        stage(f'trade_pattern.{name}', getattr(trade_pattern, name))
+    df = eda.load_data()
+    stage('eda.Frames.partner_groups', eda.Frames.partner_groups, df)
+    stage('eda.Frames.yearly_growth_rate', eda.Frames.yearly_growth_rate)
+    for name in ['world_bilateral_trade', 'mp_bilateral_trade', 'efta_bilateral_trade']:
+        stage(f'eda.Frames.{name}', getattr(eda.Frames, name), df)
+
+    if trace:
+        tracemalloc.stop()
+    return {
+        'rows': rows,
+        'seed': seed,
+        'generation_seconds': generation,
+        'tracemalloc': trace,
+        'stages': records,
+        'total_seconds': round(sum(record['seconds'] for record in records), 4),
+        'max_rss_mb': peak_rss_mb(),
+    }
+
+
+def run(scales: list = SCALES, workdir: str = WORKDIR, output: str = OUTPUT, seed: int = 0, trace: bool = True) -> dict:
+    """
+    Mide cada escala en un proceso separado (para que la memoria de una no afecte a la
+    siguiente) y guarda todos los resultados en output.
+    """
+    results = []
+    for rows in scales:
+        print(f"\nEscala: {rows} filas")
+        command = [sys.executable, os.path.abspath(__file__), '--run-scale', str(rows),
+                   '--workdir', os.path.abspath(os.path.join(workdir, str(rows))), '--seed', str(seed)]
+        if not trace:
+            command.append('--no-tracemalloc')
+        completed = subprocess.run(command, stdout=subprocess.PIPE, text=True)
+        # La última línea de la salida del proceso hijo es el JSON de la escala
+        lines = completed.stdout.strip().splitlines()
+        if completed.returncode != 0 or not lines:
+            print(completed.stdout, end='')
+            print(f"Error: la escala {rows} terminó con código {completed.returncode}.")
+            results.append({'rows': rows, 'error': completed.returncode})
+            continue
+        print('\n'.join(lines[:-1]))
+        results.append(json.loads(lines[-1]))
+
+    report = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'results': results,
+    }
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResultados guardados en '{output}'.")
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Mide tiempo y memoria de cada etapa con datos sintéticos.')
+    parser.add_argument('--scales', type=float, nargs='+', default=SCALES, help='Filas por escala (p. ej. 1e5 1e6 1e7).')
+    parser.add_argument('--workdir', default=WORKDIR, help='Directorio para los datos generados.')
+    parser.add_argument('--output', default=OUTPUT, help='Archivo JSON de resultados.')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla de los datos sintéticos.')
+    parser.add_argument('--no-tracemalloc', action='store_true',
+                        help='Sin tracemalloc (más rápido; solo se mide el pico de RSS).')
+    parser.add_argument('--run-scale', type=float, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_scale:
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        result = run_scale(int(args.run_scale), args.workdir, args.seed, not args.no_tracemalloc)
+        print(json.dumps(result))
+    else:
+        run([int(rows) for rows in args.scales], args.workdir, args.output, args.seed, not args.no_tracemalloc)
@@ -1,53 +1,95 @@
 import pandas as pd
 import os
 
-# --- Carga de datos ---
-DB = 'Data_Processed/datos_combinados.csv'
-df_trade = pd.read_csv(DB, encoding='latin1')
+import schema
+import storage
+from instrumentation import traced
 
-# --- Limpieza de datos ---
+# --- Carga de datos ---
+DB = 'datos_combinados'
 
-# Renombra las columnas para que sean más legibles
-df_trade.rename(columns={
+# Nombres legibles de las columnas de Comtrade
+COLUMN_NAMES = {
     'refPeriodId': 'Year',
     'reporterISO': 'Reporter',
     'flowCode': 'Flow',
     'partnerISO': 'Partner',
     'isOriginalClassification': 'HSCode',
     'fobvalue': 'FOBValue'
-}, inplace=True)
+}
+
+# --- Reglas de limpieza ---
+# Cada regla (columna, operador, valor) revisa una sola columna; se conservan las filas
+# que cumplen todas. Las reglas usan los nombres legibles de COLUMN_NAMES.
+CLEANING_RULES = [
+    ('HSCode', '!=', 'TOTAL'), # Eliminar totales
+]
+
+def raw_rules(rules: list = CLEANING_RULES) -> list:
+    # Las mismas reglas con los nombres de columna de Comtrade, para filtrar al leer
+    raw_names = {clean: raw for raw, clean in COLUMN_NAMES.items()}
+    return [(raw_names.get(col, col), op, value) for col, op, value in rules]
+
+@traced
+def load_combined(rules: list = CLEANING_RULES) -> pd.DataFrame:
+    # Con Parquet las reglas se aplican durante la lectura y las filas descartadas no se cargan
+    return storage.read_frame(DB, dtype={'isOriginalClassification': 'str'}, filters=raw_rules(rules))
+
+# --- Limpieza de datos ---
+@traced
+def clean_trade(df_trade: pd.DataFrame, rules: list = CLEANING_RULES) -> pd.DataFrame:
+    # Renombra las columnas para que sean más legibles
+    df_trade = df_trade.rename(columns=COLUMN_NAMES)
+
+    # Aplicar las reglas de limpieza, una máscara por columna
+    df_trade = storage.apply_filters(df_trade, rules).copy()
 
-# Eliminar totales y valores para el Mundo
-df_trade = df_trade[~df_trade.isin(['TOTAL']).any(axis=1)]
+    # Modificar valores a miles de millones (usd)
+    df_trade['FOBValue'] /= 1e6
 
-# Modificar valores a miles de millones (usd)
-df_trade['FOBValue'] /= 1e6
+    # Nivel HS (2, 4, 6 dígitos) calculado una sola vez, para no repetir regex en el análisis
+    df_trade['HSLevel'] = schema.hs_level(df_trade['HSCode'])
+
+    return df_trade
 
 # --- Guardar el dataframe limpio ---
-def save_cleared_file(df_trade=df_trade):
+def save_cleared_file(df_trade=None, fmt=None):
+    path = storage.dataset_path('trade_cleared', fmt)
     try:
-        if os.path.exists('Data_Processed/trade_cleared.csv'):
-            user_input = input('El archivo "Data_Processed/trade_cleared.csv" ya existe. ¿Desea sobrescribirlo? (s/n): ').strip().lower()
+        if df_trade is None:
+            df_trade = clean_trade(load_combined())
+
+        if os.path.exists(path):
+            user_input = input(f'El archivo "{path}" ya existe. ¿Desea sobrescribirlo? (s/n): ').strip().lower()
 
             if user_input == 's':
-                os.remove('Data_Processed/trade_cleared.csv')
-                df_trade.to_csv('Data_Processed/trade_cleared.csv', index=False, encoding='latin1')
-                print('El archivo "Data_Processed/trade_cleared.csv" se sobrescribió.')
+                storage.write_frame(df_trade, 'trade_cleared', fmt)
+                print(f'El archivo "{path}" se sobrescribió.')
             elif user_input == 'n':
-                print('El archivo "Data_Processed/trade_cleared.csv" no se sobrescribió.')
+                print(f'El archivo "{path}" no se sobrescribió.')
             else:
-                print('Opción no válida. El archivo "Data_Processed/trade_cleared.csv" no se sobrescribió.')
+                print(f'Opción no válida. El archivo "{path}" no se sobrescribió.')
 
         else:
-            user_input = input('El archivo "Data_Processed/trade_cleared.csv" no existe. ¿Desea crearlo? (s/n): ').strip().lower()
-            
+            user_input = input(f'El archivo "{path}" no existe. ¿Desea crearlo? (s/n): ').strip().lower()
             if user_input == 's':
-                df_trade.to_csv('Data_Processed/trade_cleared.csv', index=False, encoding='latin1')
-                print('El archivo "Data_Processed/trade_cleared.csv" se creó.')
+                storage.write_frame(df_trade, 'trade_cleared', fmt)
+                print(f'El archivo "{path}" se creó.')
             else:
-                print('El archivo "Data_Processed/trade_cleared.csv" no se creó.')
+                print(f'El archivo "{path}" no se creó.')
+
     except Exception as e:
         print(f'Error al guardar el archivo: {e}')
 
-# print(df_trade.info())
-# save_cleared_file()
\ No newline at end of file
+# La carga ya no ocurre al importar el módulo; clear_data.df_trade se calcula al primer acceso
+def __getattr__(name):
+    if name == 'df_trade':
+        globals()['df_trade'] = clean_trade(load_combined())
+        return globals()['df_trade']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == '__main__':
+    df_trade = clean_trade(load_combined())
+    # print(df_trade.info())
+    # save_cleared_file(df_trade)
@@ -0,0 +1,209 @@
+import pandas as pd
+import numpy as np
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+
+import schema
+import storage
+from instrumentation import traced
+
+# --- Almacén de columnas con memory map ---
+# Cada columna se guarda como un arreglo .npy sin comprimir; las dimensiones de texto como
+# códigos enteros (<col>.npy) más su diccionario (<col>.dict.json). Abrir el almacén solo lee
+# metadata.json: cada columna se abre con np.load(mmap_mode='r') en su primer uso y el sistema
+# operativo lee del disco solo las páginas que se recorren. Las filas se guardan ordenadas por
+# HSLevel (orden estable), así que un nivel HS es un rango contiguo de páginas.
+#   Data_Processed/trade_columns/metadata.json, Year.npy, Partner.npy, Partner.dict.json, ...
+SOURCE = 'trade_deflated'
+STORE = 'trade_columns'
+COLUMNS = ['Year', 'Flow', 'Partner', 'HSCode', 'HSLevel', 'RealValue']
+
+# Con TRADE_COLUMN_STORE=1 dataset.py lee del almacén (y lo crea o actualiza si hace falta)
+USE_COLUMN_STORE = os.environ.get('TRADE_COLUMN_STORE', '0') == '1'
+
+_lock = threading.Lock()
+_opened = {}
+
+
+def store_path(source: str = SOURCE) -> str:
+    return os.path.join(storage.DATA_DIR, STORE if source == SOURCE else f'{source}_columns')
+
+
+# --- Construcción ---
+@traced
+def build(source: str = SOURCE, path: str = None) -> int:
+    """
+    Escribe el almacén de source: COLUMNS y las columnas de escenarios (RealValue_<país>_<año>).
+    Se escribe en un directorio .tmp que reemplaza al anterior solo al terminar. Devuelve las filas.
+    """
+    path = path or store_path(source)
+    fingerprint = storage.fingerprint(source)
+    available = storage.columns(source)
+    columns = [col for col in COLUMNS if col in available or col == 'HSLevel']
+    columns += [col for col in available if col.startswith(schema.SCENARIO_PREFIX)]
+    read = [col for col in columns if col in available]
+    df = storage.read_frame(source, columns=read, dtype=schema.dtypes(read))
+
+    levels = df['HSLevel'].to_numpy() if 'HSLevel' in df.columns else schema.hs_level(df['HSCode']).to_numpy()
+    df['HSLevel'] = levels.astype(schema.dtypes(['HSLevel'])['HSLevel'])
+    order = np.argsort(levels, kind='stable')
+
+    tmp_path = f'{path}.tmp'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+    meta = {'source': source, 'fingerprint': fingerprint, 'rows': len(df), 'columns': {}}
+    for col in columns:
+        values = df[col]
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            with open(os.path.join(tmp_path, f'{col}.dict.json'), 'w', encoding='utf-8') as f:
+                json.dump(values.cat.categories.tolist(), f, ensure_ascii=False)
+            array = values.cat.codes.to_numpy()
+            meta['columns'][col] = 'category'
+        else:
+            array = values.to_numpy()
+            meta['columns'][col] = array.dtype.str
+        np.save(os.path.join(tmp_path, f'{col}.npy'), array[order])
+
+    with open(os.path.join(tmp_path, 'metadata.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    return len(df)
+
+
+def _metadata(path: str) -> dict:
+    meta_path = os.path.join(path, 'metadata.json')
+    if not os.path.exists(meta_path):
+        return None
+    with open(meta_path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def refresh(source: str = SOURCE) -> bool:
+    """
+    Reconstruye el almacén si el archivo de origen cambió. Devuelve True si se reconstruyó.
+    """
+    meta = _metadata(store_path(source))
+    if meta is not None and meta.get('fingerprint') == storage.fingerprint(source):
+        return False
+    rows = build(source)
+    print(f"Almacén de columnas '{store_path(source)}' reconstruido: {rows} filas.")
+    return True
+
+
+# --- Lectura ---
+class ColumnStore:
+    """
+    Almacén abierto. store[col] es el arreglo de la columna (códigos para las dimensiones)
+    mapeado en memoria y de solo lectura; frame() arma un DataFrame sin copiar los datos.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        meta = _metadata(path)
+        if meta is None:
+            raise FileNotFoundError(f"No existe el almacén de columnas '{path}'. Ver colstore.build.")
+        self.rows = meta['rows']
+        self.fingerprint = meta['fingerprint']
+        self.dtypes = meta['columns']
+        self._arrays = {}
+        self._categories = {}
+
+    @property
+    def columns(self) -> list:
+        return list(self.dtypes)
+
+    def __getitem__(self, col: str) -> np.ndarray:
+        if col not in self._arrays:
+            if col not in self.dtypes:
+                raise KeyError(f"La columna '{col}' no está en el almacén '{self.path}'")
+            self._arrays[col] = np.load(os.path.join(self.path, f'{col}.npy'), mmap_mode='r')
+        return self._arrays[col]
+
+    def categories(self, col: str) -> list:
+        if col not in self._categories:
+            with open(os.path.join(self.path, f'{col}.dict.json'), encoding='utf-8') as f:
+                self._categories[col] = json.load(f)
+        return self._categories[col]
+
+    def series(self, col: str) -> np.ndarray:
+        # Categorical sobre los códigos mapeados, o el arreglo numérico tal cual
+        if self.dtypes[col] == 'category':
+            return pd.Categorical.from_codes(self[col], categories=self.categories(col), validate=False)
+        return self[col]
+
+    def frame(self, columns: list = None, float32: bool = None) -> pd.DataFrame:
+        """
+        DataFrame de solo lectura con las columnas pedidas, con los dtypes de schema.dtypes.
+        Solo los valores en float32 (si se piden) se copian al convertirlos.
+        """
+        columns = list(columns) if columns is not None else self.columns
+        dtype = schema.dtypes(columns, float32)
+        data = {}
+        for col in columns:
+            values = self.series(col)
+            if col in dtype and dtype[col] != 'category' and values.dtype != np.dtype(dtype[col]):
+                values = values.astype(dtype[col])
+            data[col] = values
+        return pd.DataFrame(data, copy=False)
+
+
+def open_store(source: str = SOURCE) -> ColumnStore:
+    """
+    El almacén vigente de source: se reconstruye si el origen cambió y se reutiliza
+    mientras no cambie. Abrirlo no lee columnas.
+    """
+    with _lock:
+        refresh(source)
+        path = store_path(source)
+        fingerprint = _metadata(path)['fingerprint']
+        store = _opened.get(source)
+        if store is None or store.fingerprint != fingerprint:
+            store = _opened[source] = ColumnStore(path)
+        return store
+
+
+def has_columns(columns: list, source: str = SOURCE) -> bool:
+    # Si el almacén puede servir las columnas pedidas (el origen tiene todas)
+    if not columns:
+        return False
+    available = set(storage.columns(source)) | {'HSLevel'}
+    return all(col in available and (col in COLUMNS or col.startswith(schema.SCENARIO_PREFIX)) for col in columns)
+
+
+@traced
+def read_frame(columns: list, float32: bool = None, source: str = SOURCE) -> pd.DataFrame:
+    return open_store(source).frame(columns, float32)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Crea el almacén de columnas y compara su lectura con Parquet/CSV.')
+    parser.add_argument('--source', default=SOURCE, help='Archivo procesado de origen.')
+    parser.add_argument('--rebuild', action='store_true', help='Reconstruye aunque el origen no haya cambiado.')
+    args = parser.parse_args()
+
+    if args.rebuild:
+        build(args.source)
+    else:
+        refresh(args.source)
+
+    columns = ['Year', 'Flow', 'Partner', 'HSCode', 'RealValue']
+    started = time.perf_counter()
+    store = ColumnStore(store_path(args.source))
+    df = store.frame(columns)
+    opened = time.perf_counter() - started
+    started = time.perf_counter()
+    total = float(df['RealValue'].sum())
+    scanned = time.perf_counter() - started
+    started = time.perf_counter()
+    reference = storage.read_frame(args.source, columns=columns, dtype=schema.dtypes(columns))
+    read = time.perf_counter() - started
+
+    print(f'Filas: {store.rows}')
+    print(f'Abrir el almacén: {opened * 1000:.2f} ms; sumar RealValue: {scanned * 1000:.2f} ms')
+    print(f'Leer {storage.find_dataset(args.source)[1]}: {read * 1000:.2f} ms')
+    print(f"Misma suma de RealValue: {np.isclose(total, reference['RealValue'].sum())}")
@@ -1,48 +1,222 @@
 import pandas as pd
+import numpy as np
+import argparse
 import os
+from concurrent.futures import ProcessPoolExecutor
 
-# --- 1. Define la lista de archivos ---
-lista_archivos = [f"raw_data/{f}" for f in os.listdir('raw_data') if f.endswith('.csv')]
+import storage
+from instrumentation import traced
+
+# --- Configuración ---
+RAW_DIR = 'raw_data'
 columns_to_load = ['refPeriodId', 'reporterISO', 'flowCode', 'partnerISO', 'isOriginalClassification', 'fobvalue']
-print(f"Se encontraron los siguientes archivos: {lista_archivos}")
+# Tipos fijos para que todos los archivos (y todos los bloques) tengan el mismo esquema;
+# los códigos HS se leen como texto para conservar los ceros a la izquierda.
+dtypes_to_load = {
+    'reporterISO': 'str',
+    'flowCode': 'str',
+    'partnerISO': 'str',
+    'isOriginalClassification': 'str',
+    'fobvalue': 'float64',
+}
+
+# Número de procesos para la lectura (1 = lectura secuencial).
+# Se puede cambiar con la variable de entorno INGEST_WORKERS o con --workers.
+N_WORKERS = int(os.environ.get('INGEST_WORKERS', 1))
+
+# Filas por bloque en el modo streaming (--stream).
+CHUNKSIZE = int(os.environ.get('INGEST_CHUNKSIZE', 500_000))
+
+
+# --- 1. Define la lista de archivos ---
+def list_raw_files(raw_dir: str = RAW_DIR) -> list:
+    # Orden alfabético para que el resultado combinado sea siempre el mismo
+    return [f"{raw_dir}/{f}" for f in sorted(os.listdir(raw_dir)) if f.endswith('.csv')]
+
+
+# --- 2. Lectura de un archivo ---
+def _encode_columns(df: pd.DataFrame) -> dict:
+    # Las columnas de texto viajan entre procesos como códigos enteros + categorías,
+    # que se serializan mucho más rápido que un array de objetos str.
+    columnas = {}
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]):
+            columnas[col] = df[col].to_numpy()
+        else:
+            codes, uniques = pd.factorize(df[col])
+            columnas[col] = (codes, uniques)
+    return columnas
+
 
-# --- 2. Lee cada archivo y guárdalos en una lista de DataFrames ---
-dataframes = [] # Esta lista almacenará cada DataFrame leído
+def _decode_columns(columnas: dict) -> pd.DataFrame:
+    # Vuelve al texto original (código -1 = nulo) con los dtypes de la lectura secuencial,
+    # para que el resultado combinado y el archivo guardado tengan el mismo esquema
+    data = {}
+    for col, valores in columnas.items():
+        if isinstance(valores, tuple):
+            codes, uniques = valores
+            data[col] = uniques.take(codes, allow_fill=True, fill_value=np.nan)
+        else:
+            data[col] = valores
+    df = pd.DataFrame(data)
+    return df.astype({col: typ for col, typ in dtypes_to_load.items() if col in df.columns})
 
-print("Leyendo archivos...")
-for archivo in lista_archivos:
+
+def read_file(archivo: str, encode: bool = False) -> tuple:
+    """
+    Lee un archivo crudo. Devuelve (archivo, datos, mensaje); datos es None si hubo un error.
+    """
     try:
-        df_temp = pd.read_csv(archivo, encoding='latin1', usecols=columns_to_load)
-        dataframes.append(df_temp)
-        print(f"'{archivo}' leído exitosamente. Filas: {len(df_temp)}")
+        df_temp = pd.read_csv(archivo, encoding='latin1', usecols=columns_to_load, dtype=dtypes_to_load)
+        datos = _encode_columns(df_temp) if encode else df_temp
+        return archivo, datos, f"'{archivo}' leído exitosamente. Filas: {len(df_temp)}"
     except FileNotFoundError:
-        print(f"Error: El archivo '{archivo}' no fue encontrado.")
+        return archivo, None, f"Error: El archivo '{archivo}' no fue encontrado."
     except pd.errors.EmptyDataError:
-        print(f"Advertencia: El archivo '{archivo}' está vacío y será omitido.")
+        return archivo, None, f"Advertencia: El archivo '{archivo}' está vacío y será omitido."
     except Exception as e:
-        print(f"Error al leer el archivo '{archivo}': {e}")
+        return archivo, None, f"Error al leer el archivo '{archivo}': {e}"
+
+
+def _read_file_encoded(archivo: str) -> tuple:
+    return read_file(archivo, encode=True)
+
+
+# --- 3. Lee cada archivo y guárdalos en una lista de DataFrames ---
+@traced
+def read_files(lista_archivos: list, workers: int = N_WORKERS) -> list:
+    dataframes = [] # Esta lista almacenará cada DataFrame leído
+
+    if workers > 1 and len(lista_archivos) > 1:
+        print(f"Leyendo archivos con {workers} procesos...")
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            # map conserva el orden de lista_archivos, sin importar cuál proceso termina primero
+            for archivo, datos, mensaje in executor.map(_read_file_encoded, lista_archivos):
+                print(mensaje)
+                if datos is not None:
+                    dataframes.append(_decode_columns(datos))
+    else:
+        print("Leyendo archivos...")
+        for archivo in lista_archivos:
+            archivo, df_temp, mensaje = read_file(archivo)
+            print(mensaje)
+            if df_temp is not None:
+                dataframes.append(df_temp)
+
+    return dataframes
+
+
+# --- 4. Combina todos los DataFrames en uno solo ---
+@traced
+def combine(dataframes: list) -> pd.DataFrame:
+    if dataframes: # Verifica que la lista de dataframes no esté vacía
+        print("\nCombinando DataFrames...")
+        df_combinado = pd.concat(dataframes, ignore_index=True)
+
+        print("¡Archivos combinados exitosamente!")
+        print(f"El DataFrame combinado tiene {len(df_combinado)} filas y {len(df_combinado.columns)} columnas.")
+
+        print("\nPrimeras 5 filas del DataFrame combinado:")
+        print(df_combinado.head())
+
+        return df_combinado
+
+    else:
+        print("\nNo se encontraron DataFrames para combinar.")
+
+
+# --- 5. Guardar el dataframe combinado ---
+nombre_salida = 'datos_combinados'
+
+def save_combined_file(df_combinado: pd.DataFrame, nombre_salida: str = nombre_salida, fmt: str = None) -> None:
+    nombre_archivo_salida = storage.dataset_path(nombre_salida, fmt)
+    try:
+        print(f"\nGuardando DataFrame combinado en '{nombre_archivo_salida}'...")
+        storage.write_frame(df_combinado, nombre_salida, fmt)
+        print("DataFrame guardado exitosamente.")
+    except Exception as e:
+        print(f"Error al guardar el archivo '{nombre_archivo_salida}': {e}")
+
+
+# --- Modo streaming: memoria acotada ---
+def read_chunks(archivo: str, chunksize: int = CHUNKSIZE):
+    for chunk in pd.read_csv(archivo, encoding='latin1', usecols=columns_to_load,
+                             dtype=dtypes_to_load, chunksize=chunksize):
+        # Mismo orden de columnas en todos los bloques
+        yield chunk[columns_to_load]
+
+
+@traced
+def stream_files(lista_archivos: list, nombre_salida: str = nombre_salida,
+                 chunksize: int = CHUNKSIZE, fmt: str = None) -> int:
+    """
+    Lee cada archivo por bloques y escribe cada bloque directamente en la salida,
+    sin acumular DataFrames. Devuelve el total de filas escritas. Si un archivo falla
+    después de escribir algunos de sus bloques, no se guarda la salida (RuntimeError).
+    """
+    total_filas = 0
+    primeras_filas = None
+
+    print(f"Leyendo archivos por bloques de {chunksize} filas...")
+    # El archivo final solo se reemplaza cuando la escritura terminó completa
+    with storage.FrameWriter(nombre_salida, fmt) as salida:
+        for archivo in lista_archivos:
+            filas_archivo = 0
+            try:
+                for chunk in read_chunks(archivo, chunksize):
+                    salida.write(chunk)
+
+                    if primeras_filas is None:
+                        primeras_filas = chunk.head()
+                    filas_archivo += len(chunk)
+                    total_filas += len(chunk)
+
+                print(f"'{archivo}' leído exitosamente. Filas: {filas_archivo}")
+            except FileNotFoundError:
+                print(f"Error: El archivo '{archivo}' no fue encontrado.")
+            except pd.errors.EmptyDataError:
+                print(f"Advertencia: El archivo '{archivo}' está vacío y será omitido.")
+            except Exception as e:
+                if filas_archivo == 0:
+                    # Nada del archivo llegó a la salida: se omite, como en la lectura completa
+                    print(f"Error al leer el archivo '{archivo}': {e}")
+                    continue
+                # Parte del archivo ya se escribió y no se puede retirar: se cancela la escritura
+                # (el .tmp se borra y la salida anterior queda intacta), como en pipeline.py
+                raise RuntimeError(f"Error al leer el archivo '{archivo}' después de escribir "
+                                   f"{filas_archivo} filas; no se guardó '{salida.path}': {e}") from e
+
+    if total_filas == 0:
+        print("\nNo se encontraron datos para combinar.")
+        return 0
+
+    print(f"\n¡Archivos combinados exitosamente en '{salida.path}'!")
+    print(f"El archivo combinado tiene {total_filas} filas y {len(columns_to_load)} columnas.")
 
+    print("\nPrimeras 5 filas del archivo combinado:")
+    print(primeras_filas)
 
-# --- 3. Combina todos los DataFrames en uno solo ---
-if dataframes: # Verifica que la lista de dataframes no esté vacía
-    print("\nCombinando DataFrames...")
-    df_combinado = pd.concat(dataframes, ignore_index=True)
+    return total_filas
 
-    print("¡Archivos combinados exitosamente!")
-    print(f"El DataFrame combinado tiene {len(df_combinado)} filas y {len(df_combinado.columns)} columnas.")
 
-    print("\nPrimeras 5 filas del DataFrame combinado:")
-    print(df_combinado.head())
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Combina los archivos de raw_data/ en un solo archivo.')
+    parser.add_argument('--workers', type=int, default=N_WORKERS,
+                        help='Número de procesos para leer los archivos (1 = secuencial).')
+    parser.add_argument('--stream', action='store_true',
+                        help='Escribe bloque a bloque en la salida con memoria acotada.')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE,
+                        help='Filas por bloque en el modo --stream.')
+    parser.add_argument('--format', choices=list(storage.EXTENSIONS), default=storage.STORAGE_FORMAT,
+                        help='Formato de salida (parquet o csv).')
+    args = parser.parse_args()
 
-else:
-    print("\nNo se encontraron DataFrames para combinar.")
+    lista_archivos = list_raw_files()
+    print(f"Se encontraron los siguientes archivos: {lista_archivos}")
 
-# --- 4. Guardar csv con dataframe combinado ---
-nombre_archivo_salida = 'datos_combinados.csv'
-try:
-    print(f"\nGuardando DataFrame combinado en '{nombre_archivo_salida}'...")
-    # index=False evita escribir el índice del DataFrame como una columna en el CSV.
-    df_combinado.to_csv(nombre_archivo_salida, index=False)
-    print("DataFrame guardado exitosamente.")
-except Exception as e:
-    print(f"Error al guardar el archivo '{nombre_archivo_salida}': {e}")
\ No newline at end of file
+    if args.stream:
+        stream_files(lista_archivos, chunksize=args.chunksize, fmt=args.format)
+    else:
+        df_combinado = combine(read_files(lista_archivos, workers=args.workers))
+        if df_combinado is not None:
+            save_combined_file(df_combinado, fmt=args.format)
@@ -0,0 +1,139 @@
+import pandas as pd
+import numpy as np
+import json
+import os
+import threading
+
+import dataset
+import schema
+import storage
+from instrumentation import traced
+
+# --- Cubo de agregados ---
+# Sumas de RealValue y FOBValue (y número de filas) por Year × Flow × PartnerGroup × Partner
+# × HSLevel × HSCode. Partner conserva el detalle de los miembros de EFTA y de World; los demás
+# socios se agrupan en 'MainPartner'. Las medidas son aditivas: cualquier agregación más
+# gruesa se obtiene sumando filas del cubo. Las columnas de escenarios (RealValue_<país>_<año>)
+# del origen también se suman como medidas.
+SOURCE = 'trade_deflated'
+CUBE = 'trade_cube'
+METADATA = os.path.join(storage.DATA_DIR, f'{CUBE}.json')
+
+DIMENSIONS = ['Year', 'Flow', 'PartnerGroup', 'Partner', 'HSLevel', 'HSCode']
+MEASURES = ['RealValue', 'FOBValue', 'Rows']
+
+# Fuente por defecto de las funciones de análisis que aceptan source=: 'rows' o 'cube'
+DEFAULT_SOURCE = os.environ.get('TRADE_SOURCE', 'rows')
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+def resolve_source(source: str = None) -> str:
+    source = source or DEFAULT_SOURCE
+    if source not in ('rows', 'cube'):
+        raise ValueError(f"Fuente '{source}' inválida. Opciones válidas: rows, cube")
+    return source
+
+
+# --- Construcción ---
+@traced
+def build(source: str = SOURCE) -> pd.DataFrame:
+    available = storage.columns(source)
+    values = ['RealValue', 'FOBValue'] + [col for col in available if col.startswith(schema.SCENARIO_PREFIX)]
+    columns = ['Year', 'Flow', 'Partner', 'HSCode'] + values
+    if 'HSLevel' in available:
+        columns.append('HSLevel')
+    df = storage.read_frame(source, columns=columns, dtype=schema.dtypes(columns))
+    if 'HSLevel' not in df.columns:
+        df['HSLevel'] = schema.hs_level(df['HSCode'])
+
+    df['PartnerGroup'] = schema.partner_group(df['Partner'])
+
+    # Socios fuera de EFTA y World se reemplazan por su grupo, recodificando las categorías
+    categories = df['Partner'].cat.categories
+    labels = np.where(categories.isin(schema.EFTA + [schema.WORLD]), categories, 'MainPartner')
+    new_categories = pd.Index(sorted(set(labels)))
+    remap = np.append(new_categories.get_indexer(labels), -1)
+    df['Partner'] = pd.Categorical.from_codes(remap[df['Partner'].cat.codes.to_numpy()], categories=new_categories)
+
+    grouped = df.groupby(DIMENSIONS, observed=True)
+    cube = grouped[values].sum()
+    cube['Rows'] = grouped.size()
+    return cube.reset_index()
+
+
+def save(cube: pd.DataFrame, fingerprint: str, source: str = SOURCE) -> None:
+    fmt = 'parquet' if storage.HAS_PYARROW else 'csv'
+    storage.write_frame(cube, CUBE, fmt)
+    with open(f'{METADATA}.tmp', 'w', encoding='utf-8') as f:
+        json.dump({'source': source, 'fingerprint': fingerprint, 'efta': schema.EFTA, 'rows': len(cube)}, f, indent=2)
+    os.replace(f'{METADATA}.tmp', METADATA)
+
+
+def _stored_metadata() -> dict:
+    if not os.path.exists(METADATA) or not storage.exists(CUBE):
+        return {}
+    with open(METADATA, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def refresh(source: str = SOURCE) -> bool:
+    """
+    Reconstruye y guarda el cubo si el archivo de origen o los miembros de EFTA (que definen
+    el detalle de Partner) cambiaron. Devuelve True si se reconstruyó.
+    """
+    fingerprint = storage.fingerprint(source)
+    metadata = _stored_metadata()
+    if metadata.get('fingerprint') == fingerprint and metadata.get('efta') == schema.EFTA:
+        return False
+    cube = build(source)
+    save(cube, fingerprint, source)
+    print(f"Cubo '{CUBE}' reconstruido: {len(cube)} filas.")
+    return True
+
+
+# --- Consulta ---
+def _scenario(cube: pd.DataFrame) -> pd.DataFrame:
+    # El escenario elegido en dataset.select_scenario reemplaza a RealValue
+    scenario = dataset.DATASET.scenario
+    if scenario is None:
+        return cube
+    if scenario not in cube.columns:
+        raise ValueError(f"El escenario '{scenario}' no existe en el cubo '{CUBE}'.")
+    return cube.drop(columns='RealValue').rename(columns={scenario: 'RealValue'})
+
+
+def load(source: str = SOURCE) -> pd.DataFrame:
+    """
+    El cubo vigente para el archivo de origen; se reconstruye si el origen o EFTA cambiaron.
+    """
+    key = (storage.fingerprint(source), tuple(schema.EFTA))
+    with _lock:
+        if key in _loaded:
+            return _loaded[key]
+
+        refresh(source)
+        cube = storage.read_frame(CUBE, dtype=schema.dtypes(DIMENSIONS))
+        cube['Rows'] = cube['Rows'].astype('int64')
+        _loaded.clear()
+        _loaded[key] = cube
+        return cube
+
+
+def query(dims: list, filters: list = None, measures: list = None) -> pd.DataFrame:
+    """
+    Agrega el cubo a las dimensiones pedidas (roll-up), después de aplicar filters
+    con el formato de storage: [('HSLevel', '==', 6), ('Flow', '==', 'Import')].
+    """
+    cube = _scenario(load())
+    measures = measures or [col for col in cube.columns if col not in DIMENSIONS]
+    if filters:
+        cube = storage.apply_filters(cube, filters)
+    return cube.groupby(list(dims), observed=True)[measures].sum().reset_index()
+
+
+def hs_level(level: int) -> pd.DataFrame:
+    # Corte del cubo para un nivel HS, con las mismas columnas que las filas originales
+    cube = _scenario(load())
+    return cube[cube['HSLevel'].to_numpy() == level]
@@ -0,0 +1,190 @@
+import pandas as pd
+import numpy as np
+import threading
+
+import colstore
+import schema
+import storage
+from instrumentation import traced
+
+# --- Dataset compartido ---
+# Los módulos de análisis ya no leen trade_deflated al importarse: piden columnas a DATASET,
+# que lee el archivo la primera vez y reutiliza el resultado en todo el proceso.
+DB = 'trade_deflated'
+
+
+class Dataset:
+    """
+    Acceso perezoso a un archivo procesado. Cada combinación de columnas y dtypes se lee
+    una sola vez por proceso; los DataFrames devueltos son compartidos y no deben modificarse.
+    """
+
+    def __init__(self, name: str = DB, scenario: str = None):
+        self.name = name
+        # Columna RealValue_<país>_<año base> que los análisis leen como RealValue (None: RealValue)
+        self.scenario = scenario
+        self.version = 0
+        # Huella del archivo (storage.fingerprint) con la que se leyeron los datos en memoria
+        self.fingerprint = None
+        self._frames = {}
+        self._memo = {}
+        self._lock = threading.RLock()
+
+    def _key(self, columns: list, float32: bool) -> tuple:
+        dtype = schema.dtypes(columns, float32)
+        return (tuple(columns) if columns is not None else None, tuple(sorted(dtype.items())))
+
+    def _cached(self, columns: list, float32: bool = None):
+        # Frame ya leído con estas columnas, o recortado de un superconjunto con los mismos dtypes
+        key = self._key(columns, float32)
+        if key in self._frames:
+            return self._frames[key]
+        for (cols, types), frame in list(self._frames.items()):
+            if columns is not None and cols is not None and set(columns) <= set(cols) \
+                    and dict(types).items() >= dict(key[1]).items():
+                self._frames[key] = frame[list(columns)]
+                return self._frames[key]
+        return None
+
+    def check(self) -> str:
+        """
+        Huella actual del archivo. Si cambió desde la última lectura (p. ej. después de
+        pipeline.run), descarta los datos y resultados derivados en memoria.
+        """
+        try:
+            fingerprint = storage.fingerprint(self.name)
+        except FileNotFoundError:
+            return None
+        with self._lock:
+            if fingerprint != self.fingerprint:
+                if self.fingerprint is not None:
+                    self.clear()
+                self.fingerprint = fingerprint
+        return fingerprint
+
+    @traced
+    def load(self, columns: list = None, float32: bool = None) -> pd.DataFrame:
+        with self._lock:
+            self.check()
+            frame = self._cached(columns, float32)
+            if frame is not None:
+                return frame
+
+            frame = self._read(columns, float32)
+            print(f"\nEl DataFrame '{self.name}' se cargó con éxito: {len(frame)} filas.\n")
+            self._frames[self._key(columns, float32)] = frame
+            return frame
+
+    def read(self, columns: list = None, float32: bool = None) -> pd.DataFrame:
+        """
+        Lee las columnas sin guardarlas en el dataset (p. ej. para copiarlas a otro lugar y soltarlas).
+        """
+        self.check()
+        return self._read(columns, float32)
+
+    def _read(self, columns: list, float32: bool) -> pd.DataFrame:
+        if colstore.USE_COLUMN_STORE and self.name == colstore.SOURCE and columns is not None:
+            # Almacén de columnas: las columnas se mapean en memoria en vez de leerse.
+            # Sin lista de columnas (todas) se lee el archivo: el almacén solo tiene algunas.
+            cols = [self.scenario if col == 'RealValue' and self.scenario else col for col in columns]
+            if colstore.has_columns(cols):
+                return colstore.read_frame(cols, float32).rename(columns={self.scenario: 'RealValue'} if self.scenario else {})
+
+        if self.scenario is None:
+            return storage.read_frame(self.name, columns=columns, dtype=schema.dtypes(columns, float32))
+
+        # Escenario: se lee su columna en lugar de RealValue y se renombra
+        cols = columns if columns is not None else [col for col in storage.columns(self.name) if col != 'RealValue']
+        cols = list(dict.fromkeys(self.scenario if col == 'RealValue' else col for col in cols))
+        frame = storage.read_frame(self.name, columns=cols, dtype=schema.dtypes(cols, float32))
+        return frame.rename(columns={self.scenario: 'RealValue'})
+
+    def select_scenario(self, country: str = None, base_year=None) -> None:
+        """
+        Los análisis usan el RealValue del escenario (país, año base); sin argumentos,
+        vuelven al RealValue original. Descarta los datos ya cargados.
+        """
+        scenario = schema.scenario_column(country, base_year) if country is not None else None
+        if scenario is not None and scenario not in storage.columns(self.name):
+            raise ValueError(f"El escenario '{scenario}' no existe en '{self.name}'. Ver inflation_deflator.add_scenarios.")
+        with self._lock:
+            self.scenario = scenario
+            self.clear()
+
+    def hs_index(self, columns: list = None, float32: bool = None) -> tuple:
+        """
+        Las columnas pedidas ordenadas por HSLevel (orden estable) y los rangos de filas
+        de cada nivel: {2: (inicio, fin), 4: ..., 6: ...}. Se construye una vez.
+        """
+        def build():
+            cols = list(columns) if columns is not None else storage.columns(self.name)
+            with_level = cols if 'HSLevel' in cols else cols + ['HSLevel']
+            if self._cached(cols, float32) is None and 'HSLevel' in storage.columns(self.name):
+                frame = self.load(with_level, float32)
+                levels = frame['HSLevel'].to_numpy()
+            else:
+                # Columnas ya cargadas sin HSLevel, o archivos anteriores a esa columna:
+                # el nivel se calcula sobre las categorías de HSCode, sin volver a leer
+                frame = self.load(cols if 'HSCode' in cols else cols + ['HSCode'], float32)
+                levels = schema.hs_level(frame['HSCode']).to_numpy()
+                frame = frame.assign(HSLevel=levels)
+
+            if (levels[1:] >= levels[:-1]).all():
+                # Ya ordenado (p. ej. el almacén de columnas): los niveles se cortan sin copiar
+                sorted_levels = levels
+            else:
+                order = np.argsort(levels, kind='stable')
+                frame = frame.take(order).reset_index(drop=True)
+                sorted_levels = levels[order]
+            bounds = {
+                level: (int(np.searchsorted(sorted_levels, level, 'left')),
+                        int(np.searchsorted(sorted_levels, level, 'right')))
+                for level in schema.HS_LEVELS
+            }
+            return frame, bounds
+
+        key = ('hs_index', tuple(columns) if columns is not None else None, float32)
+        return self.memo(key, build)
+
+    def hs_level(self, level: int, columns: list = None, float32: bool = None) -> pd.DataFrame:
+        """
+        Filas de un nivel HS (2, 4 o 6) como un corte de filas contiguas, sin recorrer HSCode.
+        """
+        if level not in schema.HS_LEVELS:
+            raise ValueError(f'Nivel HS {level} inválido. Opciones válidas: {schema.HS_LEVELS}')
+        frame, bounds = self.hs_index(columns, float32)
+        start, stop = bounds[level]
+        return frame.iloc[start:stop]
+
+    def memo(self, key, builder):
+        """
+        Resultado derivado (p. ej. un subconjunto por nivel HS) que se calcula una vez
+        y se descarta junto con los datos en clear().
+        """
+        with self._lock:
+            self.check()
+            if key not in self._memo:
+                self._memo[key] = builder()
+            return self._memo[key]
+
+    def clear(self) -> None:
+        # Para volver a leer el archivo; check() lo llama solo cuando el archivo cambia
+        with self._lock:
+            self._frames.clear()
+            self._memo.clear()
+            self.version += 1
+
+
+DATASET = Dataset(scenario=schema.scenario_column(*schema.parse_scenario(schema.SCENARIO)) if schema.SCENARIO else None)
+
+
+def load(columns: list = None, float32: bool = None) -> pd.DataFrame:
+    return DATASET.load(columns, float32)
+
+
+def select_scenario(country: str = None, base_year=None) -> None:
+    DATASET.select_scenario(country, base_year)
+
+
+def hs_level(level: int, columns: list = None, float32: bool = None) -> pd.DataFrame:
+    return DATASET.hs_level(level, columns, float32)
@@ -5,49 +5,52 @@ import matplotlib.ticker as ticker
 import seaborn as sns
 import numpy as np
 
+import dataset
+import schema
+from instrumentation import traced
+
 # --- Configuración de datos ---
 
-DB = 'Data_Processed/trade_deflated.csv'
-DTYPES = {
-    'Year': 'str',
-    'Partner': 'str',
-    'Flow': 'str',
-    'HSCode': 'str',
-    'RealValue': 'float64'
-}
+COLS = ['Year', 'Partner', 'Flow', 'HSCode', 'RealValue']
 
 
 # --- Variables globales ---
-DF= pd.read_csv(DB, encoding='latin1', usecols=DTYPES.keys(), dtype=DTYPES)
-DF['RealValue'] = DF['RealValue'] * 1e6
-DF['RealValueLog'] = np.log1p(DF['RealValue'])
-
 LOG_SCALES = [x for x in np.expm1(range(1,23))]
 
+# Periodos de las tasas de crecimiento: (año inicial, año final), None = sin límite.
+# Por defecto, antes y después de 2011 (hasta 2010 y desde 2012).
+PERIODS = [(None, 2010), (2012, None)]
+PARTNER_GROUPS = ['EFTA', 'Primary', 'Secundary', 'World']
+GROWTH_GROUPS = {'efta': 'EFTA', 'mpp': 'Primary', 'mps': 'Secundary', 'world': 'World'}
+
 # --- Funciones utilitarias
 ## Agregar por dígitos HS
 def aggregate_hs(df: pd.DataFrame, hs:int = 2) -> pd.DataFrame:
     try:
-        match hs:
-            case 2:
-                df = df[df['HSCode'].str.match(r'^\d{2}$')].reset_index(drop=True)
-                return df
-            case 4:
-                df = df[df['HSCode'].str.match(r'^\d{4}$')].reset_index(drop=True)
-                return df
-            case 6:
-                df = df[df['HSCode'].str.match(r'^\d{6}$')].reset_index(drop=True)
-                return df
-            case _:
-                print(f'Opción {hs} inválida. Opciones válidas: 2, 4, 6')
-                return 
+        if hs not in schema.HS_LEVELS:
+            print(f'Opción {hs} inválida. Opciones válidas: 2, 4, 6')
+            return
 
-        print(df['RealValue'].describe())
-        return df
+        # HSLevel viene calculado desde la limpieza; si falta se calcula sobre las categorías
+        levels = df['HSLevel'] if 'HSLevel' in df.columns else schema.hs_level(df['HSCode'])
+        return df[levels.to_numpy() == hs].reset_index(drop=True)
     except Exception as e:
         print(f'Error agregando HS: {e}')
 
-DF = aggregate_hs(DF)
+def load_data() -> pd.DataFrame:
+    # DF: capítulos HS de 2 dígitos, en dólares y con su logaritmo. Se construye en el primer uso.
+    def build():
+        df = dataset.hs_level(2, COLS).drop(columns='HSLevel').reset_index(drop=True)
+        df['RealValue'] = df['RealValue'] * 1e6
+        df['RealValueLog'] = np.log1p(df['RealValue'])
+        return df
+    return dataset.DATASET.memo(('eda', 'DF'), build)
+
+def __getattr__(name):
+    # Compatibilidad con eda.DF
+    if name == 'DF':
+        return load_data()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # --- Clases ---
 
@@ -55,6 +58,7 @@ DF = aggregate_hs(DF)
 class Frames:
         
     @staticmethod
+    @traced
     def world_bilateral_trade(df:pd.DataFrame) -> tuple:
         try:
             
@@ -63,14 +67,14 @@ class Frames:
 
             # Top hs importaciones
             world_top_hs_imports = world.query('Flow == "Import"').reset_index()
-            world_top_hs_imports = world_top_hs_imports.groupby(['HSCode'], observed=False)['RealValue']\
+            world_top_hs_imports = world_top_hs_imports.groupby(['HSCode'], observed=True)['RealValue']\
                 .sum().nlargest(10).reset_index()
             world_top_hs_imports = world[(world['HSCode'].isin(world_top_hs_imports['HSCode'].unique()))\
                                  & (world['Flow'] == 'Import')].reset_index(drop=True)
             
             # Top hs exportaciones
             world_top_hs_exports = world.query('Flow == "Export"').reset_index()
-            world_top_hs_exports = world_top_hs_exports.groupby(['HSCode'], observed=False)['RealValue']\
+            world_top_hs_exports = world_top_hs_exports.groupby(['HSCode'], observed=True)['RealValue']\
                 .sum().nlargest(10).reset_index()
             world_top_hs_exports = world[(world['HSCode'].isin(world_top_hs_exports['HSCode'].unique()))\
                                  & (world['Flow'] == 'Export')].reset_index(drop=True)            
@@ -80,25 +84,26 @@ class Frames:
             print(f'Error construyendo world_bilateral_trade: {e}')
 
     @staticmethod
+    @traced
     def mp_bilateral_trade(df:pd.DataFrame) -> tuple:
         try:
             # Cual son los diez principales socios
-            main_partners = df.query('Partner not in ["Switzerland", "Norway", "Iceland", "World"]')\
-                .groupby('Partner')['RealValue'].sum().nlargest(5).reset_index()
+            main_partners = df[~df['Partner'].isin(schema.EFTA + [schema.WORLD])]\
+                .groupby('Partner', observed=True)['RealValue'].sum().nlargest(5).reset_index()
             
             # Comercio bilateral
             mp_bilateral_trade = df[df['Partner'].isin(main_partners['Partner'].unique())]
 
             # Top hs importaciones
             mp_top_hs_imports = mp_bilateral_trade.query('Flow == "Import"').reset_index()
-            mp_top_hs_imports = mp_top_hs_imports.groupby(['HSCode'], observed=False)['RealValue']\
+            mp_top_hs_imports = mp_top_hs_imports.groupby(['HSCode'], observed=True)['RealValue']\
                 .sum().nlargest(10).reset_index()
             mp_top_hs_imports = mp_bilateral_trade[(mp_bilateral_trade['HSCode'].isin(mp_top_hs_imports['HSCode'].unique()))\
                                  & (mp_bilateral_trade['Flow'] == 'Import')].reset_index(drop=True)
             
             # Top hs exportaciones
             mp_top_hs_exports = mp_bilateral_trade.query('Flow == "Export"').reset_index()
-            mp_top_hs_exports = mp_top_hs_exports.groupby(['HSCode'], observed=False)['RealValue']\
+            mp_top_hs_exports = mp_top_hs_exports.groupby(['HSCode'], observed=True)['RealValue']\
                 .sum().nlargest(10).reset_index()
             mp_top_hs_exports = mp_bilateral_trade[(mp_bilateral_trade['HSCode'].isin(mp_top_hs_exports['HSCode'].unique()))\
                                  & (mp_bilateral_trade['Flow'] == 'Export')].reset_index(drop=True)
@@ -110,21 +115,22 @@ class Frames:
             return
 
     @staticmethod    
+    @traced
     def efta_bilateral_trade(df:pd.DataFrame) -> tuple:
         try:
             # Comercio bilateral
-            efta_bilateral_trade = df.query('Partner in ["Switzerland", "Norway", "Iceland"]')
+            efta_bilateral_trade = df[df['Partner'].isin(schema.EFTA)]
 
             # Top hs importaciones
             efta_top_hs_imports = efta_bilateral_trade.query('Flow == "Import"').reset_index()
-            efta_top_hs_imports = efta_top_hs_imports.groupby(['HSCode'], observed=False)['RealValue']\
+            efta_top_hs_imports = efta_top_hs_imports.groupby(['HSCode'], observed=True)['RealValue']\
                 .sum().nlargest(10).reset_index()
             efta_top_hs_imports = efta_bilateral_trade[(efta_bilateral_trade['HSCode'].isin(efta_top_hs_imports['HSCode'].unique()))\
                                  & (efta_bilateral_trade['Flow'] == 'Import')].reset_index(drop=True)
             
             # Top hs exportaciones
             efta_top_hs_exports = efta_bilateral_trade.query('Flow == "Export"').reset_index()
-            efta_top_hs_exports = efta_top_hs_exports.groupby(['HSCode'], observed=False)['RealValue']\
+            efta_top_hs_exports = efta_top_hs_exports.groupby(['HSCode'], observed=True)['RealValue']\
                 .sum().nlargest(10).reset_index()
             efta_top_hs_exports = efta_bilateral_trade[(efta_bilateral_trade['HSCode'].isin(efta_top_hs_exports['HSCode'].unique()))\
                                  & (efta_bilateral_trade['Flow'] == 'Export')].reset_index(drop=True)
@@ -136,28 +142,38 @@ class Frames:
             return
     
     @staticmethod
-    def partner_groups(df:pd.DataFrame=DF) -> pd.DataFrame:
+    @traced
+    def partner_groups(df:pd.DataFrame=None, n:int=10, efta:list=None) -> pd.DataFrame:
+        """
+        Copia de df con PartnerGroup (categórica): EFTA, World, Primary (los n socios con más
+        RealValue fuera de EFTA y World) o Secundary. No modifica df. Sin df, el resultado
+        sobre los datos compartidos se guarda por huella del archivo, n y miembros de EFTA.
+        """
+        efta = schema.EFTA if efta is None else list(efta)
+
+        def build(df):
+            excluded = efta + [schema.WORLD]
+            totals = df.groupby('Partner', observed=True)['RealValue'].sum()
+            top_partners = totals[~totals.index.isin(excluded)].nlargest(n).index.tolist()
+
+            mapping = {partner: 'Primary' for partner in top_partners}
+            mapping.update({partner: 'EFTA' for partner in efta})
+            mapping[schema.WORLD] = 'World'
+            groups = schema.map_categories(df['Partner'], mapping, 'Secundary', PARTNER_GROUPS)
+            return df.assign(PartnerGroup=groups)
+
         try:
-            top_partners = df.query('Partner not in ["Switzerland", "Norway", "Iceland", "World"]')\
-                .groupby('Partner')['RealValue']\
-                .sum().nlargest(10).index.tolist()
-           
-            conditions = [df['Partner'] == 'Switzerland',
-                          df['Partner'] == 'Norway',
-                          df['Partner'] == 'Iceland',
-                          df['Partner'] == 'World',
-                          df['Partner'].isin(top_partners)]
-            choices = ['EFTA', 'EFTA', 'EFTA', 'World', 'Primary']
-            
-            df['PartnerGroup'] = np.select(conditions, choices, default='Secundary')
-            
-            return df
+            if df is None:
+                key = ('eda', 'partner_groups', dataset.DATASET.check(), n, tuple(efta))
+                return dataset.DATASET.memo(key, lambda: build(load_data()))
+            return build(df)
 
         except Exception as e:
             print(f'Error in partner_groups: {e}')
             return pd.DataFrame()
 
     @staticmethod
+    @traced
     def time_groups(df:pd.DataFrame=None) -> pd.DataFrame:
         try:
             if df is None or df.empty:
@@ -165,13 +181,8 @@ class Frames:
             if df is None or df.empty:
                 raise ValueError('df not passed or partner_groups returned None or empty')
                 
-            df['Year'] = df['Year'].astype('Int16')
-
-            df_2000_2010 = df[df['Year'] <= 2010].copy().reset_index(drop=True)
-            df_2012_2022 = df[df['Year'] >= 2012].copy().reset_index(drop=True)
-
-            df_2000_2010['Year'] = df_2000_2010['Year'].astype('str')
-            df_2012_2022['Year'] = df_2012_2022['Year'].astype('str')
+            df_2000_2010 = df[df['Year'] <= 2010].reset_index(drop=True)
+            df_2012_2022 = df[df['Year'] >= 2012].reset_index(drop=True)
 
             return [df_2000_2010, df_2012_2022]
 
@@ -179,117 +190,64 @@ class Frames:
             print(f'Error in time_groups: {e}')
 
     @staticmethod
-    def yearly_growth_rate(time_groups:list=None, who:str='all') -> pd.DataFrame:
-        if time_groups:
-            df_2000_2010, df_2012_2022 = time_groups
-        else:
-            time_groups = Frames.time_groups()
-            if time_groups is None:
-                raise ValueError('time_groups returned None')
-            df_2000_2010, df_2012_2022 = time_groups
-
-        def efta_growth_rate() -> pd.DataFrame:
-            try:            
-                # Tasa de Crecimiento para EFTA: 2000-2010
-                efta_2000_2010 = df_2000_2010.query('PartnerGroup == "EFTA"').groupby(['Flow', 'Year'])['RealValue'].sum().reset_index()
-                efta_2000_2010['GrowthRate'] = efta_2000_2010.groupby('Flow')['RealValue'].pct_change().fillna(0)
-                efta_2000_2010['GrowthRate'] *= 100
-
-                # Tasa de Crecimiento para EFTA: 2012-2022
-                efta_2012_2022 = df_2012_2022.query('PartnerGroup == "EFTA"').groupby(['Flow', 'Year'])['RealValue'].sum().reset_index()
-                efta_2012_2022['GrowthRate'] = efta_2012_2022.groupby('Flow')['RealValue'].pct_change().fillna(0)
-                efta_2012_2022['GrowthRate'] *= 100
-
-                return [efta_2000_2010, efta_2012_2022]
-            except Exception as e:
-                print(f'Error in efta_growth_rate(): {e}')
-
-        def mpp_growth_rate() -> list[pd.DataFrame]:
-            try:
-                # Tasa de Crecimiento para Secundary Partners: 2000-2010
-                mpp_2000_2010 = df_2000_2010.query('PartnerGroup == "Primary"').groupby(['Flow', 'Year'])['RealValue'].sum().reset_index()
-                mpp_2000_2010['GrowthRate'] = mpp_2000_2010.groupby('Flow')['RealValue'].pct_change().fillna(0)
-                mpp_2000_2010['GrowthRate'] *= 100
-
-                # Tasa de Crecimiento para Primary Partners: 2012-2022
-                mpp_2012_2022 = df_2012_2022.query('PartnerGroup == "Primary"').groupby(['Flow', 'Year'])['RealValue'].sum().reset_index()
-                mpp_2012_2022['GrowthRate'] = mpp_2012_2022.groupby('Flow')['RealValue'].pct_change().fillna(0)
-                mpp_2012_2022['GrowthRate'] *= 100
-
-                return [mpp_2000_2010, mpp_2012_2022]
-            except Exception as e:
-                print(f'Error in mpp_growth_rate(): {e}')
-
-        def mps_growth_rate() -> list[pd.DataFrame]:
-            try:
-                # Tasa de Crecimiento para Secundary Partners: 2000-2010
-                mps_2000_2010 = df_2000_2010.query('PartnerGroup == "Secundary"').groupby(['Flow', 'Year'])['RealValue'].sum().reset_index()
-                mps_2000_2010['GrowthRate'] = mps_2000_2010.groupby('Flow')['RealValue'].pct_change().fillna(0)
-                mps_2000_2010['GrowthRate'] *= 100
-
-                # Tasa de Crecimiento para Secundary Partners: 2012-2022
-                mps_2012_2022 = df_2012_2022.query('PartnerGroup == "Secundary"').groupby(['Flow', 'Year'])['RealValue'].sum().reset_index()
-                mps_2012_2022['GrowthRate'] = mps_2012_2022.groupby('Flow')['RealValue'].pct_change().fillna(0)
-                mps_2012_2022['GrowthRate'] *= 100
-
-                return [mps_2000_2010, mps_2012_2022]
-            except Exception as e:
-                print(f'Error in mps_growth_rate(): {e}')
-
-        def world_growth_rate() -> list[pd.DataFrame]:
-            try:
-                efta_2000_2010, efta_2012_2022 = efta_growth_rate()
-                mpp_2000_2010, mpp_2012_2022 = mpp_growth_rate()
-                mps_2000_2010, mps_2012_2022 = mps_growth_rate()
-                # Tasa de Crecimiento para el Resto del Mundo: 2000-2010
-                world_2000_2010 = df_2000_2010.query('PartnerGroup == "World"').groupby(['Flow', 'Year'])['RealValue'].sum().reset_index()
-                world_2000_2010['RealValue'] -= (efta_2000_2010['RealValue'] + mpp_2000_2010['RealValue'] + mps_2000_2010['RealValue'])
-                world_2000_2010['GrowthRate'] = world_2000_2010.groupby('Flow')['RealValue'].pct_change().fillna(0)
-                world_2000_2010['GrowthRate'] *= 100
-
-                # Tasa de Crecimiento para el Resto del Mundo: 2012-2022
-                world_2012_2022 = df_2012_2022.query('PartnerGroup == "World"').groupby(['Flow', 'Year'])['RealValue'].sum().reset_index()
-                world_2012_2022['RealValue'] -= (efta_2012_2022['RealValue'] + mpp_2012_2022['RealValue'] + mps_2012_2022['RealValue'])
-                world_2012_2022['GrowthRate'] = world_2012_2022.groupby('Flow')['RealValue'].pct_change().fillna(0)
-                world_2012_2022['GrowthRate'] *= 100                 
-            
-                return [world_2000_2010, world_2012_2022]
-            except Exception as e:
-                print(f'Error in world_growth_rate(): {e}')
-
-
-        def all_growth_rates() -> pd.DataFrame:
-            try:
-                efta1, efta2 = efta_growth_rate()
-                mpp1, mpp2 = mpp_growth_rate()
-                mps1, mps2 = mps_growth_rate()
-                world1, world2 = world_growth_rate()
-                frames = [efta1, efta2, mpp1, mpp2,
-                          mps1, mps2, world1, world2]
-                keys = ['a', 'b', 'c', 'd', 'e', 'f', 'g', 'h']
-                
-                all = pd.concat(frames, keys=keys)
-                all.loc['a':'b', 'PartnerGroup'] = 'EFTA'
-                all.loc['c':'d', 'PartnerGroup'] = 'Primary'
-                all.loc['e':'f', 'PartnerGroup'] = 'Secundary'
-                all.loc['g':'h', 'PartnerGroup'] = 'World'
+    @traced
+    def growth_rates(df:pd.DataFrame=None, periods:list=None) -> pd.DataFrame:
+        """
+        Crecimiento anual (%) de RealValue por PartnerGroup × Period × Flow en una sola pasada.
+        World es el resto del mundo: World menos los otros grupos, alineado por (Flow, Year).
+        periods: lista de (año inicial, año final); None deja el extremo abierto.
+        """
+        if df is None:
+            df = Frames.partner_groups()
+        periods = PERIODS if periods is None else periods
+
+        totals = df.groupby(['PartnerGroup', 'Flow', 'Year'], observed=True)['RealValue'].sum()
+        world = totals.xs('World', level='PartnerGroup')
+        others = totals.drop('World', level='PartnerGroup')
+        rest = world - others.groupby(level=['Flow', 'Year'], observed=True).sum().reindex(world.index, fill_value=0)
+        totals = pd.concat([others, pd.concat({'World': rest}, names=['PartnerGroup'])])
+
+        # Cada periodo toma sus años del agregado (pequeño), sin volver a recorrer las filas
+        years = totals.index.get_level_values('Year')
+        frames = {}
+        for i, (start, end) in enumerate(periods):
+            mask = np.ones(len(totals), dtype=bool)
+            if start is not None:
+                mask &= years >= start
+            if end is not None:
+                mask &= years <= end
+            frames[i] = totals[mask]
+        rates = pd.concat(frames, names=['Period']).reorder_levels(['PartnerGroup', 'Period', 'Flow', 'Year'])
+        rates = rates.sort_index(kind='stable').to_frame()
+
+        rates['GrowthRate'] = rates.groupby(level=['PartnerGroup', 'Period', 'Flow'], observed=True)['RealValue']\
+            .pct_change().fillna(0) * 100
+        return rates.reset_index()
 
-                return all
-
-            except Exception as e:
-                print(f'Error in all_growth_rates: {e}')
+    @staticmethod
+    @traced
+    def yearly_growth_rate(time_groups:list=None, who:str='all', periods:list=None) -> pd.DataFrame:
+        try:
+            if time_groups:
+                # Periodos ya separados: cada frame es un periodo completo
+                rates = pd.concat([Frames.growth_rates(frame, [(None, None)]).assign(Period=i)
+                                   for i, frame in enumerate(time_groups)])
+                rates = rates.sort_values(['PartnerGroup', 'Period'], kind='stable')
+            else:
+                rates = Frames.growth_rates(periods=periods)
+        except Exception as e:
+            print(f'Error in yearly_growth_rate: {e}')
+            return
 
+        columns = ['Flow', 'Year', 'RealValue', 'GrowthRate']
         match who:
             case 'all':
-                return all_growth_rates()
-            case 'world':        
-                return world_growth_rate()
-            case 'mpp':
-                return mpp_growth_rate()
-            case 'mps':
-                return mps_growth_rate()
-            case 'efta':
-                return efta_growth_rate()
+                return rates.set_index('Period')[columns + ['PartnerGroup']]
+            case 'world' | 'mpp' | 'mps' | 'efta':
+                # Un frame por periodo pedido, aunque alguno no tenga filas (p. ej. before, after = ...)
+                selected = rates[rates['PartnerGroup'] == GROWTH_GROUPS[who]]
+                n_periods = len(time_groups) if time_groups else len(PERIODS if periods is None else periods)
+                return [selected.loc[selected['Period'] == i, columns].reset_index(drop=True) for i in range(n_periods)]
             case _:
                 print('Opción inválida. Prueba: world, mpp, mps, efta')
             
@@ -299,7 +257,7 @@ class EDA:
 
     def distribution() -> None:
         try:
-            df = Frames.partner_groups(DF)
+            df = Frames.partner_groups(load_data())
 
             fig, axs = plt.subplots(nrows=2)
             sns.histplot(x=df['RealValueLog'], hue=df["Flow"], kde=True, ax=axs[0])
@@ -0,0 +1,182 @@
+import pandas as pd
+import argparse
+import hashlib
+import json
+import os
+import shutil
+
+import cube
+import storage
+from create_csv import RAW_DIR, list_raw_files, read_file
+from clear_data import clean_trade
+from inflation_deflator import BASE_YEAR, COUNTRY, DB_INDEX, deflate_trade, load_deflator
+from instrumentation import traced
+
+# --- Configuración ---
+# El manifiesto registra cada archivo de raw_data/ (ruta, tamaño, mtime, hash) y las filas
+# que aportó. Cada archivo escribe sus filas como part-<id>-*.parquet dentro del directorio
+# particionado, así que agregar o reemplazar un archivo no reescribe el resto del historial.
+MANIFEST = os.path.join(storage.DATA_DIR, 'manifest.json')
+OUTPUT = 'trade_deflated'
+
+
+# --- Manifiesto ---
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def file_id(path: str) -> str:
+    # Identificador estable por ruta: un archivo modificado reemplaza sus propias partes
+    return hashlib.sha1(path.encode('utf-8')).hexdigest()[:16]
+
+
+def load_manifest(path: str = MANIFEST) -> dict:
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    return {'deflator': None, 'files': {}}
+
+
+def save_manifest(manifest: dict, path: str = MANIFEST) -> None:
+    # Escritura atómica: tras una caída el manifiesto queda en el último estado consistente
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(f'{path}.tmp', 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f'{path}.tmp', path)
+
+
+def output_fingerprint(output: str = OUTPUT) -> str:
+    """
+    Huella del directorio particionado (rutas, tamaños y fechas de sus archivos), como
+    storage.fingerprint pero sin depender de TRADE_STORAGE_FORMAT.
+    """
+    path = storage.dataset_path(output, 'partitioned')
+    sha = hashlib.sha1()
+    if os.path.isdir(path):
+        for f in sorted(os.path.join(root, f) for root, _, files in os.walk(path) for f in files):
+            stat = os.stat(f)
+            sha.update(f'{f}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode('utf-8'))
+    return sha.hexdigest()
+
+
+def plan(manifest: dict, lista_archivos: list) -> tuple:
+    """
+    Devuelve (pendientes, eliminados): archivos nuevos, modificados o sin terminar, y
+    archivos del manifiesto que ya no están en raw_data/.
+    """
+    pendientes = []
+    for archivo in lista_archivos:
+        entry = manifest['files'].get(archivo)
+        stat = os.stat(archivo)
+
+        if entry is None or entry.get('status') != 'done':
+            pendientes.append(archivo)
+        elif entry['size'] != stat.st_size or entry['mtime'] != stat.st_mtime:
+            # Solo se calcula el hash si cambió el tamaño o la fecha
+            if file_hash(archivo) != entry['sha256']:
+                pendientes.append(archivo)
+            else:
+                entry['size'], entry['mtime'] = stat.st_size, stat.st_mtime
+
+    eliminados = [archivo for archivo in manifest['files'] if archivo not in lista_archivos]
+    return pendientes, eliminados
+
+
+# --- Procesamiento por archivo ---
+@traced
+def process_file(archivo: str, manifest: dict, df_deflator: pd.DataFrame, output: str = OUTPUT) -> None:
+    stat = os.stat(archivo)
+    part_id = file_id(archivo)
+    entry = {
+        'id': part_id,
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'sha256': file_hash(archivo),
+        'status': 'pending',
+    }
+    # Se marca como pendiente antes de tocar los datos: si el proceso se cae,
+    # la próxima ejecución vuelve a procesar este archivo desde cero.
+    manifest['files'][archivo] = entry
+    save_manifest(manifest)
+
+    storage.delete_parts(output, part_id)
+
+    _, df_raw, mensaje = read_file(archivo)
+    print(mensaje)
+    if df_raw is None:
+        entry.update({'status': 'done', 'rows_raw': 0, 'rows': 0, 'partitions': [], 'message': mensaje})
+        manifest['output'] = output_fingerprint(output)
+        save_manifest(manifest)
+        return
+
+    df_trade = deflate_trade(clean_trade(df_raw), df_deflator)
+    partitions = storage.write_parts(df_trade, output, part_id) if len(df_trade) else []
+
+    entry.update({'status': 'done', 'rows_raw': len(df_raw), 'rows': len(df_trade), 'partitions': partitions})
+    manifest['output'] = output_fingerprint(output)
+    save_manifest(manifest)
+
+
+@traced
+def run(raw_dir: str = RAW_DIR, full: bool = False, output: str = OUTPUT) -> dict:
+    manifest = load_manifest()
+    lista_archivos = list_raw_files(raw_dir)
+
+    # Si cambió el índice de precios (archivo, país o año base) hay que deflactar todo otra
+    # vez. Las entradas se marcan como vencidas antes de empezar para poder retomar tras una caída.
+    # Lo mismo si el directorio no es el que dejó la última ejecución (p. ej. lo reescribió
+    # pipeline.py --format partitioned): sus partes ya no corresponden al manifiesto.
+    deflator_hash = f'{file_hash(DB_INDEX)}:{COUNTRY}:{BASE_YEAR}'
+    rewritten = bool(manifest['files']) and manifest.get('output') != output_fingerprint(output)
+    if full or rewritten or manifest.get('deflator') != deflator_hash:
+        if manifest['files'] and not full:
+            if rewritten:
+                print(f"'{storage.dataset_path(output, 'partitioned')}' cambió fuera del manifiesto: se procesarán todos los archivos.")
+            else:
+                print(f"El deflactor ('{DB_INDEX}', {COUNTRY}, {BASE_YEAR}) cambió: se procesarán todos los archivos.")
+        for entry in manifest['files'].values():
+            entry['status'] = 'stale'
+        # Reconstrucción completa: se descartan también filas escritas fuera del manifiesto
+        shutil.rmtree(storage.dataset_path(output, 'partitioned'), ignore_errors=True)
+        manifest['deflator'] = deflator_hash
+        manifest['output'] = output_fingerprint(output)
+        save_manifest(manifest)
+
+    pendientes, eliminados = plan(manifest, lista_archivos)
+
+    for archivo in eliminados:
+        storage.delete_parts(output, manifest['files'][archivo]['id'])
+        del manifest['files'][archivo]
+        print(f"'{archivo}' ya no existe: se eliminaron sus filas.")
+    manifest['output'] = output_fingerprint(output)
+
+    if not pendientes:
+        save_manifest(manifest)
+        print("No hay archivos nuevos o modificados.")
+        return manifest
+
+    print(f"Archivos por procesar: {pendientes}")
+    df_deflator = load_deflator()
+    for archivo in pendientes:
+        process_file(archivo, manifest, df_deflator, output)
+
+    total = sum(entry.get('rows', 0) for entry in manifest['files'].values())
+    print(f"\n'{storage.dataset_path(output, 'partitioned')}' actualizado: {total} filas de {len(manifest['files'])} archivos.")
+    if storage.STORAGE_FORMAT != 'partitioned':
+        print("Nota: para que los módulos de análisis lean este directorio usa TRADE_STORAGE_FORMAT=partitioned.")
+    else:
+        cube.refresh(output)
+
+    return manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Procesa solo los archivos nuevos o modificados de raw_data/.')
+    parser.add_argument('--full', action='store_true', help='Vuelve a procesar todos los archivos.')
+    args = parser.parse_args()
+
+    run(full=args.full)
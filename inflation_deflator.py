@@ -1,66 +1,168 @@
 import pandas as pd
+import numpy as np
 import os
 
+import schema
+import storage
+from instrumentation import traced
+
 # --- Cargar datos ---
-DB_TRADE = 'Data_Processed/trade_cleared.csv'
-df_trade = pd.read_csv(DB_TRADE, encoding='latin1')
+DB_TRADE = 'trade_cleared'
+
+def load_cleared() -> pd.DataFrame:
+    return storage.read_frame(DB_TRADE, dtype={'HSCode': 'str'})
 
 # --- Cargar índice de precios ---
-DB_INDEX = 'Data_Processed/consumer-price-index.csv'
+# Archivo del índice, país y año base configurables por argumento o por variable de entorno
+DB_INDEX = os.environ.get('TRADE_CPI_SOURCE', 'Data_Processed/consumer-price-index.csv')
+COUNTRY = os.environ.get('TRADE_CPI_COUNTRY', 'USA')
+BASE_YEAR = os.environ.get('TRADE_CPI_BASE_YEAR', '2010')
 colums_to_load = ['Country Code', '2000', '2002', '2004', '2006', '2008','2010', '2012', '2014', '2016', '2018', '2020', '2022']
 
-df_deflator = pd.read_csv(DB_INDEX, usecols=colums_to_load)
-
-# --- Limpieza de datos ---
-df_deflator = df_deflator[df_deflator['Country Code'] == 'USA'] # Filtrar por Country Code
-df_deflator = df_deflator.drop(columns=['Country Code']) # Eliminar la columna Country Code
-
-# Reorganizar los años en una sola columna llamada 'year'
-df_deflator = pd.melt(df_deflator, id_vars=[], var_name='Year', value_name='Index')
-
-# --- Calcular deflactor ---
-base_year = '2010'
-index_base_year = df_deflator[df_deflator['Year'] == base_year]['Index'].iloc[0]
-
-df_deflator['Deflator'] = (df_deflator['Index'] / index_base_year) * 100
-
-# --- Combinar dataframe del comercio con el deflactor de inflación ---
-
-# Convertir columna 'Year' a dtype: str, para compatibilidad
-df_deflator['Year'] = df_deflator['Year'].astype(str)
-df_trade['Year'] = df_trade['Year'].astype(str)
-
-# Combinar dataframes
-df_trade_deflated = pd.merge(df_trade, df_deflator[['Year', 'Deflator']], on='Year', how='left')
-
-# --- Calcular la columna de valor real ---
-df_trade_deflated['RealValue'] = df_trade_deflated['FOBValue'] / (df_trade_deflated['Deflator'] / 100)
+@traced
+def load_deflator(country: str = None, base_year: str = None, source: str = None) -> pd.DataFrame:
+    country = country or COUNTRY
+    base_year = str(base_year or BASE_YEAR)
+    df_deflator = pd.read_csv(source or DB_INDEX, usecols=colums_to_load)
+
+    # --- Limpieza de datos ---
+    df_deflator = df_deflator[df_deflator['Country Code'] == country] # Filtrar por Country Code
+    if df_deflator.empty:
+        raise ValueError(f"El país '{country}' no está en el índice de precios.")
+    df_deflator = df_deflator.drop(columns=['Country Code']) # Eliminar la columna Country Code
+
+    # Reorganizar los años en una sola columna llamada 'year'
+    df_deflator = pd.melt(df_deflator, id_vars=[], var_name='Year', value_name='Index')
+
+    # --- Calcular deflactor ---
+    if base_year not in df_deflator['Year'].values:
+        raise ValueError(f"Año base {base_year} inválido. Opciones válidas: {list(df_deflator['Year'])}")
+    index_base_year = df_deflator[df_deflator['Year'] == base_year]['Index'].iloc[0]
+
+    df_deflator['Deflator'] = (df_deflator['Index'] / index_base_year) * 100
+
+    # Convertir columna 'Year' a dtype: str, para compatibilidad
+    df_deflator['Year'] = df_deflator['Year'].astype(str)
+
+    return df_deflator
+
+def deflator_array(df_deflator: pd.DataFrame) -> tuple:
+    """
+    El deflactor como arreglo denso indexado por año: (primer año, valores).
+    Los años sin índice quedan en NaN, igual que con el merge por la izquierda.
+    """
+    years = df_deflator['Year'].astype('int64').to_numpy()
+    first = int(years.min())
+    values = np.full(int(years.max()) - first + 1, np.nan)
+    values[years - first] = df_deflator['Deflator'].to_numpy()
+    return first, values
+
+def lookup(years: np.ndarray, first: int, values: np.ndarray) -> np.ndarray:
+    # Fila del arreglo (1D o 2D) para cada año por indexación entera; NaN fuera del rango
+    positions = years.astype('int64') - first
+    valid = (positions >= 0) & (positions < len(values))
+    result = np.full((len(years),) + values.shape[1:], np.nan)
+    result[valid] = values[positions[valid]]
+    return result
+
+# --- Aplicar el deflactor de inflación al dataframe del comercio ---
+@traced
+def deflate_trade(df_trade: pd.DataFrame, df_deflator: pd.DataFrame = None) -> pd.DataFrame:
+    if df_deflator is None:
+        df_deflator = load_deflator()
+
+    # Sin conversión a str ni merge: el deflactor de cada fila sale del arreglo por año
+    first, deflators = deflator_array(df_deflator)
+    years = df_trade['Year'].to_numpy().astype('int64')
+    deflator, factor = lookup(years, first, np.column_stack([deflators, 100 / deflators])).T
+
+    # --- Calcular la columna de valor real: una multiplicación por 100 / deflactor ---
+    return df_trade.assign(Year=years, Deflator=deflator, RealValue=df_trade['FOBValue'].to_numpy() * factor)
+
+# --- Escenarios: varios deflactores en una sola pasada ---
+def scenario_table(scenarios: list, source: str = None) -> tuple:
+    """
+    Factores 100 / deflactor de cada escenario (país, año base) en un arreglo 2D
+    (años × escenarios): (primer año, factores, nombres de columna).
+    """
+    tables = [deflator_array(load_deflator(country, base_year, source)) for country, base_year in scenarios]
+    first = min(start for start, _ in tables)
+    last = max(start + len(values) for start, values in tables)
+
+    factors = np.full((last - first, len(tables)), np.nan)
+    for j, (start, values) in enumerate(tables):
+        factors[start - first:start - first + len(values), j] = 100 / values
+
+    columns = [schema.scenario_column(country, base_year) for country, base_year in scenarios]
+    return first, factors, columns
+
+@traced
+def deflate_scenarios(df_trade: pd.DataFrame, table: tuple) -> pd.DataFrame:
+    # Todas las columnas RealValue_<país>_<año base> con una sola multiplicación 2D
+    first, factors, columns = table
+    years = df_trade['Year'].to_numpy().astype('int64')
+    real = df_trade['FOBValue'].to_numpy()[:, None] * lookup(years, first, factors)
+    return df_trade.assign(**{column: real[:, j] for j, column in enumerate(columns)})
+
+@traced
+def add_scenarios(scenarios: list, name: str = 'trade_deflated', fmt: str = None, source: str = None) -> pd.DataFrame:
+    """
+    Lee el archivo deflactado una vez, agrega las columnas de todos los escenarios
+    (reemplazando las que ya existan) y lo vuelve a guardar.
+    """
+    fmt = fmt or storage.find_dataset(name)[1]
+    if fmt == 'partitioned':
+        # Las partes del directorio pertenecen al manifiesto de incremental.py
+        raise ValueError("Los escenarios de un directorio particionado se calculan con pipeline.py --scenario.")
+
+    table = scenario_table(scenarios, source)
+    df_trade = storage.read_frame(name, dtype=schema.dtypes(storage.columns(name)))
+    df_trade = deflate_scenarios(df_trade, table)
+    storage.write_frame(df_trade, name, fmt)
+    print(f"Escenarios agregados a '{name}': {table[2]}")
+    return df_trade
 
 # --- Guardar el dataframe con la inflación deflactada ---
-def save_deflated_file(df_trade_deflated=df_trade_deflated):
+def save_deflated_file(df_trade_deflated=None, fmt=None):
+    path = storage.dataset_path('trade_deflated', fmt)
     try:
-        if os.path.exists('Data_Processed/trade_deflated.csv'):
-            user_input = input('El archivo "Data_Processed/trade_deflated.csv" ya existe. ¿Desea sobrescribirlo? (s/n): ').strip().lower()
+        if df_trade_deflated is None:
+            df_trade_deflated = deflate_trade(load_cleared())
+
+        if os.path.exists(path):
+            user_input = input(f'El archivo "{path}" ya existe. ¿Desea sobrescribirlo? (s/n): ').strip().lower()
 
             if user_input == 's':
-                os.remove('Data_Processed/trade_deflated.csv')
-                df_trade_deflated.to_csv('Data_Processed/trade_deflated.csv', index=False, encoding='latin1')
-                print('El archivo "Data_Processed/trade_deflated.csv" se sobrescribió.')
+                storage.write_frame(df_trade_deflated, 'trade_deflated', fmt)
+                print(f'El archivo "{path}" se sobrescribió.')
             elif user_input == 'n':
-                print('El archivo "Data_Processed/trade_deflated.csv" no se sobrescribió.')
+                print(f'El archivo "{path}" no se sobrescribió.')
             else:
-                print('Opción no válida. El archivo "Data_Processed/trade_deflated.csv" no se sobrescribió.')
+                print(f'Opción no válida. El archivo "{path}" no se sobrescribió.')
 
         else:
-            user_input = input('El archivo "Data_Processed/trade_deflated.csv" no existe. ¿Desea crearlo? (s/n): ').strip().lower()
+            user_input = input(f'El archivo "{path}" no existe. ¿Desea crearlo? (s/n): ').strip().lower()
             if user_input == 's':
-                df_trade_deflated.to_csv('Data_Processed/trade_deflated.csv', index=False, encoding='latin1')
-                print('El archivo "Data_Processed/trade_deflated.csv" se creó.')
+                storage.write_frame(df_trade_deflated, 'trade_deflated', fmt)
+                print(f'El archivo "{path}" se creó.')
             else:
-                print('El archivo "Data_Processed/trade_deflated.csv" no se creó.')
+                print(f'El archivo "{path}" no se creó.')
 
     except Exception as e:
         print(f'Error al guardar el archivo: {e}')
 
-# print(df_trade_deflated.info())
-# save_deflated_file()
\ No newline at end of file
+# La carga ya no ocurre al importar el módulo; inflation_deflator.df_trade_deflated se calcula al primer acceso
+def __getattr__(name):
+    if name == 'df_deflator':
+        globals()['df_deflator'] = load_deflator()
+        return globals()['df_deflator']
+    if name == 'df_trade_deflated':
+        globals()['df_trade_deflated'] = deflate_trade(load_cleared())
+        return globals()['df_trade_deflated']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+if __name__ == '__main__':
+    df_trade_deflated = deflate_trade(load_cleared())
+    # print(df_trade_deflated.info())
+    # save_deflated_file(df_trade_deflated)
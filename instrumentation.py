@@ -0,0 +1,193 @@
+import pandas as pd
+import numpy as np
+import argparse
+import functools
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+    import resource
+    HAS_RESOURCE = True
+except ImportError:
+    # Windows: sin pico de RSS
+    HAS_RESOURCE = False
+
+# --- Instrumentación por etapa ---
+# Las etapas del pipeline y las funciones públicas de análisis llevan el decorador @traced.
+# Con TRADE_TRACE=<archivo.jsonl> (o TRADE_TRACE=1 para trace.jsonl) cada llamada agrega una
+# línea JSON con tiempo de reloj y de CPU, pico de RSS, filas y bytes de entrada y salida.
+# Con TRADE_TRACE_MEMORY=1 se mide también el pico de tracemalloc (más lento).
+# Desactivado, el decorador solo revisa una variable antes de llamar a la función.
+DEFAULT_TRACE = 'trace.jsonl'
+
+_path = None
+_memory = False
+_lock = threading.Lock()
+_local = threading.local()
+RUN_ID = f'{socket.gethostname()}-{os.getpid()}-{int(time.time())}'
+
+# ru_maxrss viene en KB en Linux y en bytes en macOS
+RSS_UNIT = 1024 ** 2 if sys.platform == 'darwin' else 1024
+
+
+def enable(path: str = DEFAULT_TRACE, memory: bool = False) -> None:
+    global _path, _memory
+    _path = path
+    _memory = memory
+    if memory and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+
+def disable() -> None:
+    global _path, _memory
+    _path = None
+    if _memory and tracemalloc.is_tracing():
+        tracemalloc.stop()
+    _memory = False
+
+
+def enabled() -> bool:
+    return _path is not None
+
+
+def peak_rss_mb() -> float:
+    # Pico de memoria residente del proceso hasta ahora, en MB (None si no se puede medir)
+    if not HAS_RESOURCE:
+        return None
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / RSS_UNIT, 2)
+
+
+def _size(value) -> tuple:
+    # (filas, bytes) de un DataFrame/Series/arreglo o de una lista/tupla de ellos; bytes sin deep
+    if isinstance(value, pd.DataFrame):
+        return len(value), int(value.memory_usage(index=False).sum())
+    if isinstance(value, pd.Series):
+        return len(value), int(value.memory_usage(index=False))
+    if isinstance(value, np.ndarray):
+        return len(value), int(value.nbytes)
+    if isinstance(value, (list, tuple)):
+        sizes = [_size(item) for item in value]
+        sizes = [size for size in sizes if size[0] is not None]
+        if sizes:
+            return sum(rows for rows, _ in sizes), sum(nbytes for _, nbytes in sizes)
+    return None, None
+
+
+def _write(record: dict) -> None:
+    line = json.dumps(record, default=str) + '\n'
+    with _lock:
+        with open(_path, 'a', encoding='utf-8') as f:
+            f.write(line)
+
+
+def _call(stage: str, func, args, kwargs):
+    # Pila de picos de tracemalloc por hilo: reset_peak en una etapa anidada no debe
+    # borrar el pico de la etapa que la contiene
+    stack = getattr(_local, 'peaks', None)
+    if stack is None:
+        stack = _local.peaks = []
+    memory = _memory and tracemalloc.is_tracing()
+    if memory:
+        if stack:
+            stack[-1] = max(stack[-1], tracemalloc.get_traced_memory()[1])
+        tracemalloc.reset_peak()
+    stack.append(0)
+
+    rows_in, bytes_in = _size([value for value in list(args) + list(kwargs.values())])
+    started = time.time()
+    wall, cpu = time.perf_counter(), time.process_time()
+    error = None
+    try:
+        result = func(*args, **kwargs)
+        return result
+    except Exception as e:
+        result = None
+        error = repr(e)
+        raise
+    finally:
+        record = {
+            'run': RUN_ID,
+            'pid': os.getpid(),
+            'stage': stage,
+            'depth': len(stack) - 1,
+            'start': round(started, 6),
+            'wall_seconds': round(time.perf_counter() - wall, 6),
+            'cpu_seconds': round(time.process_time() - cpu, 6),
+            'peak_rss_mb': peak_rss_mb(),
+            'rows_in': rows_in,
+            'bytes_in': bytes_in,
+        }
+        record['rows_out'], record['bytes_out'] = _size(result)
+        peak = stack.pop()
+        if memory:
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            record['peak_traced_mb'] = round(peak / 1024 ** 2, 2)
+            if stack:
+                stack[-1] = max(stack[-1], peak)
+        if error:
+            record['error'] = error
+        _write(record)
+
+
+def traced(func=None, *, stage: str = None):
+    """
+    Decorador: registra cada llamada de func en la traza si la instrumentación está activa.
+    Uso: @traced o @traced(stage='nombre'). En métodos estáticos va debajo de @staticmethod.
+    """
+    if func is None:
+        return functools.partial(traced, stage=stage)
+    name = stage or f'{func.__module__}.{func.__qualname__}'
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if _path is None:
+            return func(*args, **kwargs)
+        return _call(name, func, args, kwargs)
+    return wrapper
+
+
+def load_trace(path: str = DEFAULT_TRACE) -> pd.DataFrame:
+    return pd.read_json(path, lines=True)
+
+
+def summarize(path: str = DEFAULT_TRACE) -> pd.DataFrame:
+    """
+    Resumen por etapa de una o varias ejecuciones: llamadas, tiempo total y medio,
+    CPU, picos de memoria y filas, ordenado por tiempo total (los puntos calientes primero).
+    """
+    trace = load_trace(path)
+    aggregations = {
+        'calls': ('wall_seconds', 'size'),
+        'runs': ('run', 'nunique'),
+        'wall_total': ('wall_seconds', 'sum'),
+        'wall_mean': ('wall_seconds', 'mean'),
+        'wall_max': ('wall_seconds', 'max'),
+        'cpu_total': ('cpu_seconds', 'sum'),
+        'peak_rss_mb': ('peak_rss_mb', 'max'),
+        'rows_in': ('rows_in', 'max'),
+        'rows_out': ('rows_out', 'max'),
+    }
+    if 'peak_traced_mb' in trace.columns:
+        aggregations['peak_traced_mb'] = ('peak_traced_mb', 'max')
+    return trace.groupby('stage').agg(**aggregations).sort_values('wall_total', ascending=False).reset_index()
+
+
+# Activación por variable de entorno al importar
+if os.environ.get('TRADE_TRACE'):
+    enable(DEFAULT_TRACE if os.environ['TRADE_TRACE'] == '1' else os.environ['TRADE_TRACE'],
+           os.environ.get('TRADE_TRACE_MEMORY', '0') == '1')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Resume una traza JSON-lines por etapa.')
+    parser.add_argument('path', nargs='?', default=DEFAULT_TRACE, help='Archivo de traza.')
+    parser.add_argument('--top', type=int, default=20, help='Etapas a mostrar.')
+    args = parser.parse_args()
+
+    with pd.option_context('display.width', 200, 'display.max_columns', None):
+        print(summarize(args.path).head(args.top))
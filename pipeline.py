@@ -0,0 +1,92 @@
+import pandas as pd
+import argparse
+from contextlib import ExitStack
+
+import colstore
+import cube
+import schema
+import storage
+from create_csv import CHUNKSIZE, RAW_DIR, list_raw_files, read_chunks
+from clear_data import CLEANING_RULES, clean_trade
+from inflation_deflator import BASE_YEAR, COUNTRY, deflate_scenarios, deflate_trade, load_deflator, scenario_table
+from instrumentation import traced
+
+# --- Pipeline completo: raw_data/ → trade_deflated ---
+# Cada bloque de cada archivo pasa por renombrado, limpieza, escala /1e6 y deflactor
+# en memoria; solo se escribe el resultado final (y, si se pide, los intermedios).
+OUTPUT = 'trade_deflated'
+INTERMEDIATES = ('datos_combinados', 'trade_cleared')
+
+
+@traced
+def run(raw_dir: str = RAW_DIR, chunksize: int = CHUNKSIZE, fmt: str = None,
+        keep_intermediates: bool = False, rules: list = CLEANING_RULES,
+        country: str = COUNTRY, base_year: str = BASE_YEAR, cpi_source: str = None, scenarios: list = None) -> int:
+    """
+    Ejecuta el pipeline sin preguntas interactivas. Devuelve las filas escritas en trade_deflated.
+    scenarios: lista de (país, año base); agrega una columna RealValue_<país>_<año base> por escenario.
+    """
+    df_deflator = load_deflator(country, base_year, cpi_source)
+    table = scenario_table(scenarios, cpi_source) if scenarios else None
+    lista_archivos = list_raw_files(raw_dir)
+    print(f"Se encontraron los siguientes archivos: {lista_archivos}")
+
+    filas_crudas = 0
+    with ExitStack() as stack:
+        # Los archivos finales solo se reemplazan si todo el pipeline termina sin errores
+        salida = stack.enter_context(storage.FrameWriter(OUTPUT, fmt))
+        intermedios = {}
+        if keep_intermediates:
+            intermedios = {name: stack.enter_context(storage.FrameWriter(name, fmt)) for name in INTERMEDIATES}
+
+        for archivo in lista_archivos:
+            filas_archivo = 0
+            try:
+                for chunk in read_chunks(archivo, chunksize):
+                    if intermedios:
+                        intermedios['datos_combinados'].write(chunk)
+
+                    df_trade = clean_trade(chunk, rules)
+                    if intermedios:
+                        intermedios['trade_cleared'].write(df_trade)
+
+                    df_trade = deflate_trade(df_trade, df_deflator)
+                    if table is not None:
+                        df_trade = deflate_scenarios(df_trade, table)
+                    salida.write(df_trade)
+                    filas_archivo += len(chunk)
+
+                print(f"'{archivo}' procesado. Filas: {filas_archivo}")
+            except FileNotFoundError:
+                print(f"Error: El archivo '{archivo}' no fue encontrado.")
+            except pd.errors.EmptyDataError:
+                print(f"Advertencia: El archivo '{archivo}' está vacío y será omitido.")
+            filas_crudas += filas_archivo
+
+    print(f"\nFilas leídas: {filas_crudas}. Filas escritas en '{salida.path}': {salida.rows}.")
+    for name, writer in intermedios.items():
+        print(f"Intermedio '{writer.path}': {writer.rows} filas.")
+
+    # El cubo de agregados (y el almacén de columnas, si se usa) se reconstruye a partir de la salida nueva
+    cube.refresh(OUTPUT)
+    if colstore.USE_COLUMN_STORE:
+        colstore.refresh(OUTPUT)
+    return salida.rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Procesa raw_data/ hasta trade_deflated en una sola pasada.')
+    parser.add_argument('--chunksize', type=int, default=CHUNKSIZE, help='Filas por bloque.')
+    parser.add_argument('--format', choices=list(storage.EXTENSIONS), default=storage.STORAGE_FORMAT,
+                        help='Formato de salida.')
+    parser.add_argument('--keep-intermediates', action='store_true',
+                        help='Guarda también datos_combinados y trade_cleared.')
+    parser.add_argument('--country', default=COUNTRY, help='País del índice de precios.')
+    parser.add_argument('--base-year', default=BASE_YEAR, help='Año base del deflactor.')
+    parser.add_argument('--cpi-source', default=None, help='Archivo CSV del índice de precios.')
+    parser.add_argument('--scenario', action='append', type=schema.parse_scenario, default=[],
+                        help='Escenario adicional PAÍS:AÑO_BASE (se puede repetir).')
+    args = parser.parse_args()
+
+    run(chunksize=args.chunksize, fmt=args.format, keep_intermediates=args.keep_intermediates,
+        country=args.country, base_year=args.base_year, cpi_source=args.cpi_source, scenarios=args.scenario)
@@ -0,0 +1,247 @@
+import pandas as pd
+import argparse
+import os
+import tempfile
+import threading
+
+import dataset
+import schema
+import storage
+
+try:
+    import duckdb
+    HAS_DUCKDB = True
+except ImportError:
+    HAS_DUCKDB = False
+
+# --- Motor de consultas perezoso (DuckDB) ---
+# Las agregaciones de trade_volume y trade_pattern se expresan como consultas SQL sobre los
+# archivos procesados: DuckDB lee solo las columnas y los grupos de filas que la consulta
+# necesita (proyección y filtros empujados hasta Parquet) y ejecuta con varios hilos.
+# Se elige con engine='duckdb' en cada llamada o con TRADE_ENGINE=duckdb para todo el proceso.
+ENGINES = ('pandas', 'duckdb')
+DEFAULT_ENGINE = os.environ.get('TRADE_ENGINE', 'pandas')
+THREADS = int(os.environ.get('TRADE_ENGINE_THREADS', os.cpu_count() or 1))
+
+_local = threading.local()
+
+
+def resolve_engine(engine: str = None) -> str:
+    engine = engine or DEFAULT_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Motor '{engine}' inválido. Opciones válidas: {ENGINES}")
+    if engine == 'duckdb' and not HAS_DUCKDB:
+        raise ImportError("El motor 'duckdb' requiere el paquete duckdb (pip install duckdb)")
+    return engine
+
+
+def _connection():
+    # Una conexión por hilo: una conexión de DuckDB no se comparte entre hilos
+    if getattr(_local, 'connection', None) is None:
+        _local.connection = duckdb.connect()
+        _local.connection.execute(f'SET threads = {THREADS}')
+    return _local.connection
+
+
+def _literal(value) -> str:
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return str(int(value))
+
+
+def _values(values: list) -> str:
+    return ', '.join(_literal(value) for value in values)
+
+
+def relation(name: str) -> str:
+    """
+    Expresión FROM de DuckDB para un archivo procesado (Parquet, directorio particionado o CSV).
+    """
+    path, fmt = storage.find_dataset(name)
+    path = path.replace("'", "''")
+    if fmt == 'partitioned':
+        return f"read_parquet('{path}/**/*.parquet', hive_partitioning = true)"
+    if fmt == 'parquet':
+        return f"read_parquet('{path}')"
+    return f"read_csv('{path}', header = true, encoding = 'latin-1', types = {{'HSCode': 'VARCHAR'}})"
+
+
+def _level_condition(name: str, level: int) -> str:
+    # HSLevel viene calculado desde la limpieza; en archivos anteriores se deduce de HSCode
+    if 'HSLevel' in storage.columns(name):
+        return f'HSLevel = {int(level)}'
+    return f"length(HSCode) = {int(level)} AND regexp_full_match(HSCode, '[0-9]+')"
+
+
+def _value_column() -> str:
+    # Columna del escenario elegido en dataset.select_scenario (RealValue si no hay)
+    return dataset.DATASET.scenario or 'RealValue'
+
+
+def _sum(value: str, condition: str = None) -> str:
+    # Suma como en pandas: se ignoran nulos y NaN, y un grupo sin valores suma 0
+    condition = f'NOT isnan({value})' + (f' AND {condition}' if condition else '')
+    return f'COALESCE(SUM({value}) FILTER (WHERE {condition}), 0)'
+
+
+def query(sql: str) -> pd.DataFrame:
+    return _connection().execute(sql).df()
+
+
+def _to_schema(df: pd.DataFrame) -> pd.DataFrame:
+    # Mismos dtypes que los DataFrames de dataset.py (Year int16, dimensiones categóricas)
+    df = df.astype(schema.dtypes(df.columns))
+    for col in df.columns:
+        if isinstance(df[col].dtype, pd.CategoricalDtype):
+            df[col] = df[col].cat.set_categories(df[col].cat.categories.sort_values())
+    return df
+
+
+def aggregate_sql(name: str, level: int, by: list, partners: str = None, flow: str = None) -> str:
+    """
+    Consulta con las sumas de RealValue por las columnas by para un nivel HS, con el mismo
+    conjunto de socios que trade_pattern.rank: 'world' (todo menos EFTA, con la columna
+    RealValue_EFTA), 'efta', 'main_partners' (todos menos EFTA y World) o None (todos).
+    """
+    value = _value_column()
+    efta = f'Partner IN ({_values(schema.EFTA)})'
+    # Como groupby(dropna=True): las filas con nulos en las columnas de agrupación se descartan
+    conditions = [_level_condition(name, level)] + [f'{col} IS NOT NULL' for col in by]
+    if flow is not None:
+        conditions.append(f'Flow = {_literal(flow)}')
+
+    if partners == 'world':
+        measures = f'{_sum(value)} - {_sum(value, efta)} AS RealValue, {_sum(value, efta)} AS RealValue_EFTA'
+    else:
+        measures = f'{_sum(value)} AS RealValue'
+        if partners == 'efta':
+            conditions.append(efta)
+        elif partners == 'main_partners':
+            conditions.append(f'COALESCE(Partner NOT IN ({_values(schema.EFTA + [schema.WORLD])}), true)')
+
+    columns = ', '.join(by)
+    return f"""
+        SELECT {columns}, {measures}
+        FROM {relation(name)}
+        WHERE {' AND '.join(conditions)}
+        GROUP BY {columns}
+    """
+
+
+def aggregate(name: str, level: int, by: list, partners: str = None, flow: str = None) -> pd.DataFrame:
+    sql = aggregate_sql(name, level, by, partners, flow)
+    return _to_schema(query(f"{sql} ORDER BY {', '.join(by)}"))
+
+
+def top_n(name: str, level: int, by: list, group_keys: list, n: int, partners: str, flow: str = None) -> pd.DataFrame:
+    """
+    Top n por grupo dentro de DuckDB, con el orden y el desempate de
+    trade_pattern.top_n_per_group: valor descendente y, en empates, el orden de by.
+    """
+    group_keys = ', '.join(group_keys)
+    order = f"{group_keys}, RealValue DESC, {', '.join(by)}"
+    sql = f"""
+        SELECT * FROM ({aggregate_sql(name, level, by, partners, flow)})
+        QUALIFY row_number() OVER (PARTITION BY {group_keys} ORDER BY RealValue DESC, {', '.join(by)}) <= {int(n)}
+        ORDER BY {order}
+    """
+    return _to_schema(query(sql))
+
+
+# --- Paridad con pandas ---
+def check_parity(rtol: float = 1e-9, source: str = None) -> list:
+    """
+    Ejecuta las funciones públicas de trade_volume y trade_pattern con ambos motores sobre
+    los datos de Data_Processed/ y compara los resultados (mismas filas, columnas y orden;
+    valores con tolerancia rtol por el orden distinto de las sumas en punto flotante).
+    Devuelve las funciones que difieren.
+    """
+    import trade_pattern
+    import trade_volume
+
+    functions = [(trade_volume, name) for name in ('efta_trade_volume', 'main_partners_trade_volume',
+                                                   'world_trade_volume', 'relative_world_trade_volume',
+                                                   'efta_relative_trade_volume')]
+    functions += [(trade_pattern, f'{partners}_{hs}') for partners in ('world', 'efta', 'main_partners')
+                  for hs in ('sectors', 'industries', 'products')]
+
+    def normalize(df):
+        df = df.reset_index(drop=True)
+        for col in df.columns:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype(str)
+            elif pd.api.types.is_numeric_dtype(df[col]):
+                df[col] = df[col].astype('float64')
+        return df
+
+    failures = []
+    for module, name in functions:
+        expected = getattr(module, name)(source=source, engine='pandas')
+        result = getattr(module, name)(source=source, engine='duckdb')
+        try:
+            for left, right in zip(expected, result, strict=True):
+                pd.testing.assert_frame_equal(normalize(left), normalize(right), rtol=rtol)
+            print(f'{module.__name__}.{name}: OK')
+        except (AssertionError, TypeError, ValueError) as e:
+            print(f'{module.__name__}.{name}: DIFERENTE\n{e}')
+            failures.append(f'{module.__name__}.{name}')
+    return failures
+
+
+def check_parity_synthetic(rows: int = 50_000, seed: int = 0, formats: tuple = ('parquet', 'csv', 'partitioned'),
+                           sources: tuple = ('rows', 'cube'), rtol: float = 1e-9) -> None:
+    """
+    Prueba reproducible de paridad: genera datos sintéticos (synthetic.py) en un directorio
+    temporal, los procesa con pipeline.py en cada formato y compara ambos motores con cada
+    fuente. Lanza AssertionError con las combinaciones que difieren.
+    """
+    import pipeline
+    import result_cache
+    import synthetic
+
+    resolve_engine('duckdb')
+    cwd, fmt, cache = os.getcwd(), storage.STORAGE_FORMAT, result_cache.enabled()
+    # Los resultados se calculan siempre: la caché podría devolver los de otra corrida
+    result_cache.disable()
+    failures = []
+    try:
+        with tempfile.TemporaryDirectory(prefix='parity-') as directory:
+            for storage_format in formats:
+                # Un directorio por formato: find_dataset no debe encontrar los archivos de otro
+                os.chdir(directory)
+                os.makedirs(storage_format)
+                os.chdir(storage_format)
+                storage.STORAGE_FORMAT = storage_format
+                synthetic.generate(rows, '.', seed)
+                pipeline.run(fmt=storage_format)
+                dataset.DATASET.clear()
+                for source in sources:
+                    print(f'\n--- Formato {storage_format}, fuente {source} ---')
+                    failures += [f'{storage_format}/{source}: {name}' for name in check_parity(rtol, source)]
+    finally:
+        os.chdir(cwd)
+        storage.STORAGE_FORMAT = fmt
+        dataset.DATASET.clear()
+        if cache:
+            result_cache.enable()
+    assert not failures, f'Diferencias entre pandas y DuckDB: {failures}'
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Motor DuckDB para trade_volume y trade_pattern.')
+    parser.add_argument('--check', action='store_true',
+                        help='Compara ambos motores sobre datos sintéticos generados en un directorio temporal.')
+    parser.add_argument('--check-data', action='store_true',
+                        help='Compara ambos motores sobre los datos de Data_Processed/.')
+    parser.add_argument('--rows', type=int, default=50_000, help='Filas sintéticas para --check.')
+    args = parser.parse_args()
+
+    if args.check:
+        check_parity_synthetic(args.rows)
+        print('\nSin diferencias entre pandas y DuckDB.')
+    elif args.check_data:
+        failures = check_parity()
+        print(f"\nFunciones con diferencias: {failures or 'ninguna'}")
+        raise SystemExit(1 if failures else 0)
+    else:
+        parser.print_help()
@@ -0,0 +1,214 @@
+import pandas as pd
+import argparse
+import functools
+import hashlib
+import inspect
+import json
+import os
+import pickle
+import threading
+
+import cube
+import dataset
+import query_engine
+import schema
+import storage
+
+# --- Caché de resultados en disco ---
+# Las funciones públicas de trade_volume y trade_pattern llevan el decorador @cached. La clave
+# de cada resultado es un hash de la huella del archivo procesado (storage.fingerprint), el
+# escenario, los miembros de EFTA, el uso de float32, el nombre de la función y sus argumentos
+# (source y engine ya resueltos): al regenerar los datos la clave cambia y los resultados
+# anteriores se descartan solos. Cada resultado es un pickle (protocolo binario más reciente)
+# en CACHE_DIR; al pasar de MAX_MB se borran los usados hace más tiempo (LRU por fecha de
+# modificación, que se actualiza en cada acierto).
+# Se activa con TRADE_CACHE=1 o con enable().
+CACHE_DIR = os.path.join(storage.DATA_DIR, 'cache')
+MAX_MB = float(os.environ.get('TRADE_CACHE_MB', 256))
+EXTENSION = '.pkl'
+
+_enabled = os.environ.get('TRADE_CACHE', '0') == '1'
+_lock = threading.Lock()
+_stats = {}
+
+
+def enable(max_mb: float = None) -> None:
+    global _enabled, MAX_MB
+    _enabled = True
+    if max_mb is not None:
+        MAX_MB = max_mb
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+# --- Claves ---
+def _context() -> tuple:
+    # Lo que, además de los argumentos, cambia el resultado de las funciones de análisis.
+    # check() descarta antes los datos en memoria si el archivo cambió: el resultado se
+    # calcula con los datos de la huella de la clave.
+    fingerprint = dataset.DATASET.check()
+    return fingerprint, [dataset.DATASET.name, dataset.DATASET.scenario, schema.EFTA, schema.USE_FLOAT32]
+
+
+def make_key(func, args: tuple, kwargs: dict) -> tuple:
+    """
+    (huella, clave): la clave es el sha1 de la función, sus argumentos con los valores por
+    defecto aplicados y el contexto de los datos. (None, None) si no existe el archivo.
+    """
+    bound = inspect.signature(func).bind(*args, **kwargs)
+    bound.apply_defaults()
+    # None y el valor por defecto explícito (p. ej. source='rows') son la misma llamada
+    if 'source' in bound.arguments:
+        bound.arguments['source'] = cube.resolve_source(bound.arguments['source'])
+    if 'engine' in bound.arguments:
+        bound.arguments['engine'] = query_engine.resolve_engine(bound.arguments['engine'])
+    fingerprint, context = _context()
+    if fingerprint is None:
+        return None, None
+    payload = json.dumps([f'{func.__module__}.{func.__qualname__}', bound.arguments, context],
+                         sort_keys=True, default=repr)
+    return fingerprint, hashlib.sha1(f'{fingerprint}:{payload}'.encode('utf-8')).hexdigest()
+
+
+def _path(fingerprint: str, key: str) -> str:
+    # El prefijo con la huella permite borrar de una vez los resultados de datos anteriores
+    return os.path.join(CACHE_DIR, f'{fingerprint[:16]}_{key}{EXTENSION}')
+
+
+# --- Lectura y escritura ---
+def _count(name: str, field: str) -> None:
+    counts = _stats.setdefault(name, {'hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0})
+    counts[field] += 1
+
+
+def get(fingerprint: str, key: str):
+    # (True, resultado) si está en caché; (False, None) si no
+    path = _path(fingerprint, key)
+    try:
+        with open(path, 'rb') as f:
+            result = pickle.load(f)
+    except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+        return False, None
+    try:
+        os.utime(path)
+    except FileNotFoundError:
+        pass
+    return True, result
+
+
+def put(fingerprint: str, key: str, result, name: str = None) -> None:
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _path(fingerprint, key)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+    evict(fingerprint, name)
+
+
+def entries() -> pd.DataFrame:
+    # Archivos de la caché con su tamaño y último uso, del más antiguo al más reciente
+    rows = []
+    if os.path.isdir(CACHE_DIR):
+        for entry in os.scandir(CACHE_DIR):
+            if entry.name.endswith(EXTENSION):
+                stat = entry.stat()
+                rows.append((entry.path, entry.name.split('_', 1)[0], stat.st_size, stat.st_mtime_ns))
+    return pd.DataFrame(rows, columns=['path', 'fingerprint', 'bytes', 'used']).sort_values('used', ignore_index=True)
+
+
+def evict(fingerprint: str = None, name: str = None) -> int:
+    """
+    Borra los resultados de otras huellas (datos anteriores) y, si la caché pasa de
+    MAX_MB, los usados hace más tiempo. Devuelve los archivos borrados.
+    """
+    with _lock:
+        files = entries()
+        stale = files['fingerprint'] != fingerprint[:16] if fingerprint else pd.Series(False, index=files.index)
+        removed = files[stale]
+        files = files[~stale]
+        excess = files['bytes'].sum() - MAX_MB * 1024 ** 2
+        if excess > 0:
+            # Los más antiguos hasta liberar lo que sobra
+            removed = pd.concat([removed, files[files['bytes'].cumsum() - files['bytes'] < excess]])
+        for path in removed['path']:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            if name:
+                _count(name, 'evictions')
+        return len(removed)
+
+
+def clear() -> int:
+    files = entries()
+    for path in files['path']:
+        os.remove(path)
+    return len(files)
+
+
+# --- Decorador ---
+def cached(func):
+    """
+    Decorador: con la caché activa, devuelve el resultado guardado para los mismos datos y
+    argumentos, o lo calcula y lo guarda. Los resultados None (errores) no se guardan, ni los
+    calculados mientras el archivo cambiaba.
+    """
+    name = f'{func.__module__}.{func.__qualname__}'
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _enabled:
+            return func(*args, **kwargs)
+        fingerprint, key = make_key(func, args, kwargs)
+        if key is None:
+            return func(*args, **kwargs)
+        hit, result = get(fingerprint, key)
+        if hit:
+            _count(name, 'hits')
+            return result
+        _count(name, 'misses')
+        result = func(*args, **kwargs)
+        # Solo si los datos en memoria siguen siendo los de la huella de la clave
+        if result is not None and dataset.DATASET.fingerprint == fingerprint:
+            put(fingerprint, key, result, name)
+            _count(name, 'stores')
+        return result
+    return wrapper
+
+
+def stats() -> pd.DataFrame:
+    """
+    Aciertos, fallos, resultados guardados y borrados por función en este proceso,
+    con la tasa de aciertos.
+    """
+    table = pd.DataFrame.from_dict(_stats, orient='index', columns=['hits', 'misses', 'stores', 'evictions'])
+    table.index.name = 'function'
+    calls = table['hits'] + table['misses']
+    table['hit_rate'] = (table['hits'] / calls.where(calls > 0)).round(3)
+    return table.reset_index()
+
+
+def reset_stats() -> None:
+    _stats.clear()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Tamaño de la caché de resultados o borrado de sus archivos.')
+    parser.add_argument('--clear', action='store_true', help='Borra todos los resultados guardados.')
+    args = parser.parse_args()
+
+    if args.clear:
+        print(f"Resultados borrados: {clear()}.")
+    else:
+        files = entries()
+        print(f"Caché '{CACHE_DIR}': {len(files)} resultados, {files['bytes'].sum() / 1024 ** 2:.2f} MB "
+              f"de {MAX_MB:g} MB, {files['fingerprint'].nunique()} huellas.")
@@ -0,0 +1,101 @@
+import pandas as pd
+import numpy as np
+import os
+
+# --- Esquema compartido de los datos procesados ---
+# Dimensiones de texto como categorías (códigos enteros + diccionario): ocupan una
+# fracción de la memoria de un str y los filtros/groupby trabajan sobre los códigos.
+DIMENSIONS = ['Reporter', 'Partner', 'Flow', 'HSCode']
+VALUES = ['FOBValue', 'Deflator', 'RealValue']
+
+# Socios: miembros de EFTA y el agregado mundial que reporta Comtrade.
+# Los miembros se pueden cambiar con TRADE_EFTA (nombres separados por comas).
+EFTA = os.environ.get('TRADE_EFTA', 'Switzerland,Norway,Iceland').split(',')
+WORLD = 'World'
+PARTNER_GROUPS = ['EFTA', 'MainPartner', 'World']
+
+# Niveles del Sistema Armonizado: capítulos (2), partidas (4) y subpartidas (6)
+HS_LEVELS = (2, 4, 6)
+
+# Escenarios de deflactación: una columna RealValue_<país>_<año base> por escenario.
+# TRADE_SCENARIO=COL:2000 hace que los análisis lean esa columna como RealValue.
+SCENARIO_PREFIX = 'RealValue_'
+SCENARIO = os.environ.get('TRADE_SCENARIO')
+
+# Valores en float32 (la mitad de memoria, con ~7 dígitos de precisión). Desactivado por defecto.
+USE_FLOAT32 = os.environ.get('TRADE_FLOAT32', '0') == '1'
+
+
+def dtypes(columns=None, float32: bool = None) -> dict:
+    """
+    Dtypes para leer las columnas indicadas (todas las conocidas si columns es None).
+    """
+    float32 = USE_FLOAT32 if float32 is None else float32
+    schema = {'Year': 'int16', 'HSLevel': 'int8'}
+    schema.update({col: 'category' for col in DIMENSIONS + ['PartnerGroup']})
+    schema.update({col: 'float32' if float32 else 'float64' for col in VALUES})
+
+    if columns is None:
+        return schema
+    return {col: schema[col] if col in schema else schema['RealValue']
+            for col in columns if col in schema or col.startswith(SCENARIO_PREFIX)}
+
+
+def scenario_column(country: str, base_year) -> str:
+    return f'{SCENARIO_PREFIX}{country}_{base_year}'
+
+
+def parse_scenario(text: str) -> tuple:
+    # 'COL:2000' -> ('COL', '2000')
+    country, _, base_year = text.partition(':')
+    if not country or not base_year:
+        raise ValueError(f"Escenario '{text}' inválido. Formato: PAÍS:AÑO_BASE, p. ej. COL:2000")
+    return country, base_year
+
+
+def hs_level(hs_codes: pd.Series) -> pd.Series:
+    """
+    Nivel HS de cada código: número de dígitos (2, 4 o 6), o 0 si no es un código HS.
+    """
+    if isinstance(hs_codes.dtype, pd.CategoricalDtype):
+        # Se calcula una vez por categoría y se reparte con los códigos enteros;
+        # el 0 agregado al final es el nivel de los nulos (código -1)
+        levels = np.append(hs_level(pd.Series(hs_codes.cat.categories, dtype='str')).to_numpy(), 0)
+        return pd.Series(levels[hs_codes.cat.codes.to_numpy()].astype('int8'), index=hs_codes.index)
+
+    hs_codes = hs_codes.astype('str')
+    length = hs_codes.str.len()
+    valid = hs_codes.str.isdigit() & length.isin(HS_LEVELS)
+    return length.where(valid, 0).astype('int8')
+
+
+def map_categories(values: pd.Series, mapping: dict, default: str, categories: list) -> pd.Series:
+    """
+    Reetiqueta una columna con una tabla de búsqueda sobre sus categorías: cada categoría
+    se traduce una vez y las filas se reparten con los códigos enteros. Devuelve una
+    columna categórica; los valores fuera de mapping (y los nulos) reciben default.
+    """
+    if not isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype('category')
+    labels = values.cat.categories.map(lambda value: mapping.get(value, default))
+    lookup = np.append(pd.Index(categories).get_indexer(labels), categories.index(default))
+    codes = lookup[values.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, categories=categories), index=values.index)
+
+
+def partner_group(partners: pd.Series, efta: list = None) -> pd.Series:
+    """
+    Grupo de cada socio: EFTA, World o MainPartner (todos los demás).
+    """
+    mapping = {partner: 'EFTA' for partner in (EFTA if efta is None else efta)}
+    mapping[WORLD] = 'World'
+    return map_categories(partners, mapping, 'MainPartner', PARTNER_GROUPS)
+
+
+def apply_schema(df: pd.DataFrame, float32: bool = None) -> pd.DataFrame:
+    return df.astype(dtypes(df.columns, float32))
+
+
+def memory_usage(df: pd.DataFrame) -> float:
+    # Memoria en MB, contando el contenido de las cadenas
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
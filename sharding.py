@@ -0,0 +1,127 @@
+import pandas as pd
+import os
+import shutil
+import tempfile
+import weakref
+from concurrent.futures import ProcessPoolExecutor
+
+import dataset
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc as ipc
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# --- Ejecución por fragmentos en varios procesos ---
+# El DataFrame se divide por Year × Flow y se escribe una sola vez en un archivo Arrow IPC
+# (un grupo de record batches por fragmento). Cada proceso abre el archivo con memory map y
+# lee solo sus batches, sin recibir DataFrames serializados con pickle; devuelve un resultado
+# parcial pequeño que el proceso principal combina. Con una clave (p. ej. el nivel HS) el
+# archivo se escribe una vez por versión de los datos y lo reutilizan las llamadas siguientes.
+SHARD_BY = ['Year', 'Flow']
+
+# Procesos por defecto (1 = sin paralelismo). Se puede cambiar con TRADE_WORKERS.
+WORKERS = int(os.environ.get('TRADE_WORKERS', 1))
+
+# Tareas por proceso: cada tarea toma varios fragmentos contiguos completos, para no pagar
+# el costo fijo de func una vez por cada Year × Flow
+TASKS_PER_WORKER = 2
+
+
+def write_shards(df: pd.DataFrame, shard_by: list, path: str) -> list:
+    """
+    Escribe df en path agrupado por shard_by. Devuelve, en el orden de los grupos,
+    (clave, primer batch, último batch + 1) de cada fragmento.
+    """
+    groups = df.groupby(list(shard_by), observed=True, sort=True).indices
+    shards = []
+    schema = None
+    batch = 0
+    with pa.OSFile(path, 'wb') as sink:
+        writer = None
+        for key, positions in groups.items():
+            table = pa.Table.from_pandas(df.take(positions), schema=schema, preserve_index=False)
+            if writer is None:
+                # Todas las partes comparten el esquema (y los diccionarios de las categorías)
+                schema = table.schema
+                writer = ipc.new_file(sink, schema)
+            batches = table.to_batches()
+            for record_batch in batches:
+                writer.write_batch(record_batch)
+            shards.append((key, batch, batch + len(batches)))
+            batch += len(batches)
+        if writer is not None:
+            writer.close()
+    return shards
+
+
+def read_shard(path: str, start: int, stop: int) -> pd.DataFrame:
+    # Los batches se leen del archivo mapeado en memoria; solo se copian al pasar a pandas
+    with pa.memory_map(path, 'r') as source:
+        reader = ipc.open_file(source)
+        table = pa.Table.from_batches([reader.get_batch(i) for i in range(start, stop)], schema=reader.schema)
+        return table.to_pandas()
+
+
+def _run_shard(path: str, start: int, stop: int, func, args: tuple):
+    return func(read_shard(path, start, stop), *args)
+
+
+class ShardFile:
+    """
+    df escrito por fragmentos en un directorio temporal. El directorio se borra con close()
+    o cuando el objeto deja de usarse (p. ej. al descartar los datos en dataset.clear()).
+    """
+
+    def __init__(self, df: pd.DataFrame, shard_by: list = SHARD_BY):
+        directory = tempfile.mkdtemp(prefix='shards-')
+        self._finalizer = weakref.finalize(self, shutil.rmtree, directory, True)
+        self.path = os.path.join(directory, 'shards.arrow')
+        self.shards = write_shards(df, shard_by, self.path)
+
+    def close(self) -> None:
+        self._finalizer()
+
+
+def shard_file(df: pd.DataFrame, shard_by: list = SHARD_BY, key=None) -> ShardFile:
+    """
+    Archivo de fragmentos de df. Con key se guarda en dataset.DATASET.memo: la clave debe
+    identificar a df (p. ej. ('rank', nivel HS, flujo)) y el archivo se reescribe solo cuando
+    cambian los datos.
+    """
+    if key is None:
+        return ShardFile(df, shard_by)
+    return dataset.DATASET.memo(('sharding', key, tuple(shard_by)), lambda: ShardFile(df, shard_by))
+
+
+def run_sharded(df: pd.DataFrame, func, args: tuple = (), shard_by: list = SHARD_BY, workers: int = None,
+                key=None) -> list:
+    """
+    Aplica func(parte, *args) en un grupo de procesos, donde cada parte reúne fragmentos
+    completos de df (por shard_by): func debe dar el mismo resultado por partes que sobre
+    df si sus grupos contienen shard_by, y poder importarse desde un módulo.
+    Devuelve los resultados en el orden de las claves de shard_by. Con key, los fragmentos
+    escritos se reutilizan en las llamadas siguientes (ver shard_file).
+    """
+    workers = WORKERS if workers is None else workers
+    if workers <= 1 or not HAS_PYARROW:
+        # Sin procesos (o sin pyarrow): todo en una sola parte, en este proceso
+        return [func(df, *args)]
+
+    files = shard_file(df, shard_by, key)
+    try:
+        path, shards = files.path, files.shards
+        if not shards:
+            return [func(df, *args)]
+        # Rangos contiguos de batches, cada uno con varios fragmentos completos
+        tasks = min(len(shards), workers * TASKS_PER_WORKER)
+        bounds = [round(i * len(shards) / tasks) for i in range(tasks + 1)]
+        ranges = [(shards[first][1], shards[last - 1][2]) for first, last in zip(bounds, bounds[1:])]
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(_run_shard, path, start, stop, func, args) for start, stop in ranges]
+            return [future.result() for future in futures]
+    finally:
+        if key is None:
+            files.close()
@@ -0,0 +1,136 @@
+import pandas as pd
+import numpy as np
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import resource_tracker, shared_memory
+
+import dataset
+
+# --- Dataset en memoria compartida ---
+# El proceso principal copia las columnas una sola vez a un bloque de memoria compartida
+# (dimensiones como códigos enteros, valores como arreglos numéricos) y pasa a los procesos
+# hijos solo un descriptor pequeño. Cada hijo arma un DataFrame de solo lectura sobre ese
+# bloque, sin copiar: la memoria total con N procesos es cercana a una sola copia.
+ALIGNMENT = 64
+
+# Bloques creados y bloques abiertos por este proceso; los arreglos del DataFrame apuntan a ellos
+_owned = {}
+_attached = {}
+
+
+class SharedFrame:
+    """
+    Dueño del bloque compartido en el proceso principal. handle es el descriptor que se
+    envía a los procesos hijos. Al cerrar (o al salir del with) el bloque se libera.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        columns, offset = [], 0
+        arrays = {}
+        for col in df.columns:
+            values = df[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                array = values.cat.codes.to_numpy()
+                categories = values.cat.categories.tolist()
+            else:
+                array = values.to_numpy()
+                categories = None
+            if array.dtype == object:
+                raise TypeError(f"La columna '{col}' es de texto: conviértela a categoría antes de publicarla")
+            offset = -(-offset // ALIGNMENT) * ALIGNMENT
+            columns.append((col, array.dtype.str, offset, categories))
+            arrays[col] = (offset, array)
+            offset += array.nbytes
+
+        self.shm = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+        for offset, array in arrays.values():
+            np.ndarray(array.shape, dtype=array.dtype, buffer=self.shm.buf, offset=offset)[:] = array
+        self.handle = {'name': self.shm.name, 'rows': len(df), 'columns': columns}
+        _owned[self.shm.name] = self.shm
+
+    @property
+    def nbytes(self) -> int:
+        return self.shm.size
+
+    def close(self) -> None:
+        if self.shm is not None:
+            _owned.pop(self.shm.name, None)
+            self.shm.unlink()
+            try:
+                self.shm.close()
+            except BufferError:
+                # Aún hay DataFrames sobre el bloque en este proceso: la memoria se libera
+                # cuando dejan de usarse; el nombre ya no existe para otros procesos
+                pass
+            self.shm = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _open(name: str) -> shared_memory.SharedMemory:
+    # El bloque pertenece al proceso principal: los hijos no deben liberarlo al terminar
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 no tiene track=False
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, 'shared_memory')
+        return shm
+
+
+def attach(handle: dict) -> pd.DataFrame:
+    """
+    DataFrame de solo lectura sobre el bloque compartido, sin copiar los datos.
+    Las dimensiones vuelven como categorías con los mismos códigos.
+    """
+    # En el proceso que creó el bloque se usa el mismo objeto (ya registrado para liberarlo)
+    shm = _owned.get(handle['name']) or _attached.get(handle['name'])
+    if shm is None:
+        shm = _attached[handle['name']] = _open(handle['name'])
+
+    data = {}
+    for col, dtype, offset, categories in handle['columns']:
+        array = np.ndarray(handle['rows'], dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+        array.flags.writeable = False
+        if categories is not None:
+            # Los códigos vienen de una columna categórica válida: no se revisan otra vez
+            array = pd.Categorical.from_codes(array, categories=categories, validate=False)
+        data[col] = array
+    return pd.DataFrame(data, copy=False)
+
+
+def publish(columns: list = None, float32: bool = None) -> SharedFrame:
+    """
+    Publica en memoria compartida las columnas del dataset compartido (ver dataset.py).
+    Se leen sin guardarlas en DATASET: después de copiarlas al bloque, el proceso principal
+    solo conserva la copia compartida.
+    """
+    return SharedFrame(dataset.DATASET.read(columns, float32))
+
+
+# --- Procesos que comparten el bloque ---
+_frame = None
+
+
+def _init_worker(handle: dict) -> None:
+    global _frame
+    _frame = attach(handle)
+
+
+def _run(func, task):
+    return func(_frame, task)
+
+
+def map_tasks(func, tasks: list, shared: SharedFrame, workers: int = None) -> list:
+    """
+    Ejecuta func(df, tarea) para cada tarea en un grupo de procesos. Cada proceso se conecta
+    una vez al bloque compartido; las tareas (p. ej. combinaciones de socios y periodos)
+    viajan como argumentos pequeños. func debe poder importarse desde un módulo.
+    """
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(shared.handle,)) as executor:
+        return list(executor.map(_run, [func] * len(tasks), tasks))
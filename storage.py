@@ -0,0 +1,318 @@
+import pandas as pd
+import hashlib
+import operator
+import os
+import shutil
+
+from instrumentation import traced
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+# --- Configuración ---
+DATA_DIR = 'Data_Processed'
+ENCODING = 'latin1'
+EXTENSIONS = {'parquet': '.parquet', 'csv': '.csv', 'partitioned': ''}
+
+# Formato de los archivos intermedios (datos_combinados, trade_cleared, trade_deflated).
+# Parquet conserva los dtypes y permite leer solo algunas columnas; CSV queda para exportar.
+# 'partitioned' es un directorio Parquet particionado por año y flujo:
+#   Data_Processed/trade_deflated/Year=2010/Flow=Import/part-0-0.parquet
+STORAGE_FORMAT = os.environ.get('TRADE_STORAGE_FORMAT', 'parquet' if HAS_PYARROW else 'csv')
+
+# Columnas de partición: (nombre limpio, nombre en los datos crudos de Comtrade)
+PARTITION_COLS = [('Year', 'refPeriodId'), ('Flow', 'flowCode')]
+
+OPERATORS = {
+    '==': operator.eq, '=': operator.eq, '!=': operator.ne,
+    '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge,
+}
+
+
+# --- Rutas ---
+def dataset_path(name: str, fmt: str = None) -> str:
+    fmt = fmt or STORAGE_FORMAT
+    if fmt not in EXTENSIONS:
+        raise ValueError(f"Formato '{fmt}' inválido. Opciones válidas: {list(EXTENSIONS)}")
+    return os.path.join(DATA_DIR, f'{name}{EXTENSIONS[fmt]}')
+
+
+def find_dataset(name: str) -> tuple:
+    """
+    Devuelve (ruta, formato) del archivo existente para name, prefiriendo STORAGE_FORMAT.
+    """
+    formats = [STORAGE_FORMAT] + [fmt for fmt in EXTENSIONS if fmt != STORAGE_FORMAT]
+    for fmt in formats:
+        path = dataset_path(name, fmt)
+        if (os.path.isdir(path) if fmt == 'partitioned' else os.path.isfile(path)):
+            return path, fmt
+    raise FileNotFoundError(f"No existe '{name}' en '{DATA_DIR}' (.parquet, .csv o directorio particionado)")
+
+
+def dataset_files(name: str) -> list:
+    path, fmt = find_dataset(name)
+    if fmt != 'partitioned':
+        return [path]
+    return sorted(os.path.join(root, f) for root, _, files in os.walk(path) for f in files)
+
+
+def fingerprint(name: str) -> str:
+    """
+    Huella del archivo procesado (rutas, tamaños y fechas de modificación). Cambia
+    cada vez que el archivo se reescribe, sin leer su contenido.
+    """
+    sha = hashlib.sha1()
+    for f in dataset_files(name):
+        stat = os.stat(f)
+        sha.update(f'{f}:{stat.st_size}:{stat.st_mtime_ns}\n'.encode('utf-8'))
+    return sha.hexdigest()
+
+
+def partition_columns(columns) -> list:
+    cols = []
+    for clean, raw in PARTITION_COLS:
+        if clean in columns:
+            cols.append(clean)
+        elif raw in columns:
+            cols.append(raw)
+    return cols
+
+
+def exists(name: str) -> bool:
+    try:
+        find_dataset(name)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+# --- Lectura ---
+def columns(name: str) -> list:
+    path, fmt = find_dataset(name)
+    if fmt == 'csv':
+        return pd.read_csv(path, encoding=ENCODING, nrows=0).columns.tolist()
+    partitioning = 'hive' if fmt == 'partitioned' else None
+    return ds.dataset(path, format='parquet', partitioning=partitioning).schema.names
+
+
+def filter_mask(df: pd.DataFrame, filters: list) -> pd.Series:
+    """
+    Máscara booleana de las filas que cumplen todas las condiciones; cada condición
+    revisa una sola columna.
+    """
+    mask = pd.Series(True, index=df.index)
+    for col, op, value in filters:
+        if op == 'in':
+            mask &= df[col].isin(value)
+        elif op == 'not in':
+            mask &= ~df[col].isin(value)
+        else:
+            mask &= OPERATORS[op](df[col], value)
+    return mask
+
+
+def apply_filters(df: pd.DataFrame, filters: list) -> pd.DataFrame:
+    return df[filter_mask(df, filters)]
+
+
+def filter_expression(filters: list):
+    """
+    Traduce las condiciones a una expresión de pyarrow para filtrar durante la lectura.
+    '!=' y 'not in' conservan los nulos, igual que las máscaras de pandas.
+    """
+    expression = None
+    for col, op, value in filters:
+        field = ds.field(col)
+        if op == 'in':
+            condition = field.isin(value)
+        elif op == 'not in':
+            condition = ~field.isin(value) | field.is_null()
+        elif op == '!=':
+            condition = (field != value) | field.is_null()
+        else:
+            condition = OPERATORS[op](field, value)
+        expression = condition if expression is None else expression & condition
+    return expression
+
+
+@traced
+def read_frame(name: str, columns: list = None, dtype: dict = None, filters: list = None) -> pd.DataFrame:
+    """
+    Lee un archivo intermedio. Con Parquet solo se leen las columnas pedidas.
+
+    filters es una lista de condiciones (columna, operador, valor) unidas con AND, p. ej.
+    [('Flow', '==', 'Import'), ('Year', '>=', 2012)]. En el formato particionado las
+    condiciones sobre Year/Flow descartan directorios completos sin abrirlos.
+    """
+    path, fmt = find_dataset(name)
+    columns = list(columns) if columns is not None else None
+
+    if fmt == 'csv':
+        usecols = columns
+        if filters and columns is not None:
+            usecols = columns + [col for col, _, _ in filters if col not in columns]
+        df = pd.read_csv(path, encoding=ENCODING, usecols=usecols, dtype=dtype)
+        if filters:
+            df = apply_filters(df, filters)[columns or df.columns].reset_index(drop=True)
+        return df
+
+    if fmt == 'partitioned':
+        dataset = ds.dataset(path, format='parquet', partitioning='hive')
+    else:
+        dataset = ds.dataset(path, format='parquet')
+    expression = filter_expression(filters) if filters else None
+    df = dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+    if dtype:
+        df = df.astype({col: typ for col, typ in dtype.items() if col in df.columns})
+        # Las categorías de Parquet vienen en orden de aparición; se ordenan como en read_csv
+        # para que groupby/sort devuelvan el mismo orden con cualquier formato.
+        for col, typ in dtype.items():
+            if typ == 'category' and col in df.columns:
+                categories = df[col].cat.categories
+                if not categories.is_monotonic_increasing:
+                    df[col] = df[col].cat.set_categories(categories.sort_values())
+    return df
+
+
+# --- Escritura ---
+class FrameWriter:
+    """
+    Escribe un archivo intermedio por bloques. Se escribe a un .tmp que reemplaza
+    al archivo final solo al cerrar sin errores.
+    """
+
+    def __init__(self, name: str, fmt: str = None):
+        self.fmt = fmt or STORAGE_FORMAT
+        if self.fmt == 'parquet' and not HAS_PYARROW:
+            raise ImportError("El formato 'parquet' requiere pyarrow")
+        if self.fmt == 'partitioned' and not HAS_PYARROW:
+            raise ImportError("El formato 'partitioned' requiere pyarrow")
+        self.path = dataset_path(name, self.fmt)
+        self.tmp_path = f'{self.path}.tmp'
+        os.makedirs(DATA_DIR, exist_ok=True)
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+        self._file = None
+        self._chunks = 0
+
+    def write(self, df: pd.DataFrame) -> None:
+        if self.fmt == 'partitioned':
+            if self._schema is None:
+                shutil.rmtree(self.tmp_path, ignore_errors=True)
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                self._schema = table.schema
+            else:
+                table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+            ds.write_dataset(
+                table, self.tmp_path, format='parquet',
+                partitioning=partition_columns(table.column_names), partitioning_flavor='hive',
+                basename_template=f'part-{self._chunks}-{{i}}.parquet',
+                existing_data_behavior='overwrite_or_ignore',
+            )
+            self._chunks += 1
+        elif self.fmt == 'parquet':
+            if self._writer is None:
+                table = pa.Table.from_pandas(df, preserve_index=False)
+                self._schema = table.schema
+                self._writer = pq.ParquetWriter(self.tmp_path, self._schema)
+            else:
+                # Todos los bloques se escriben con el esquema del primero
+                table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+            self._writer.write_table(table)
+        else:
+            header = self._file is None
+            if header:
+                self._file = open(self.tmp_path, 'w', newline='', encoding=ENCODING)
+            df.to_csv(self._file, index=False, header=header)
+        self.rows += len(df)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+        if os.path.isdir(self.tmp_path):
+            shutil.rmtree(self.path, ignore_errors=True)
+            os.replace(self.tmp_path, self.path)
+        elif os.path.exists(self.tmp_path):
+            os.replace(self.tmp_path, self.path)
+
+    def abort(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+        if self._file is not None:
+            self._file.close()
+        if os.path.isdir(self.tmp_path):
+            shutil.rmtree(self.tmp_path)
+        elif os.path.exists(self.tmp_path):
+            os.remove(self.tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+@traced
+def write_frame(df: pd.DataFrame, name: str, fmt: str = None) -> str:
+    with FrameWriter(name, fmt) as writer:
+        writer.write(df)
+    return writer.path
+
+
+def export_csv(name: str) -> str:
+    """
+    Exporta un archivo intermedio Parquet a CSV (latin1), junto al original.
+    """
+    df = read_frame(name)
+    return write_frame(df, name, fmt='csv')
+
+
+# --- Partes por archivo de origen (ingesta incremental) ---
+def part_files(name: str, part_id: str) -> list:
+    path = dataset_path(name, 'partitioned')
+    if not os.path.isdir(path):
+        return []
+    prefix = f'part-{part_id}-'
+    return [os.path.join(root, f) for root, _, files in os.walk(path) for f in files if f.startswith(prefix)]
+
+
+def delete_parts(name: str, part_id: str) -> int:
+    """
+    Borra del directorio particionado las filas que aportó part_id. Devuelve los archivos borrados.
+    """
+    files = part_files(name, part_id)
+    for f in files:
+        os.remove(f)
+    return len(files)
+
+
+def write_parts(df: pd.DataFrame, name: str, part_id: str) -> list:
+    """
+    Agrega df al directorio particionado con archivos part-<part_id>-<i>.parquet,
+    sin tocar las filas de otras partes. Devuelve las particiones escritas.
+    """
+    if not HAS_PYARROW:
+        raise ImportError("El formato 'partitioned' requiere pyarrow")
+    path = dataset_path(name, 'partitioned')
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    written = []
+    ds.write_dataset(
+        table, path, format='parquet',
+        partitioning=partition_columns(table.column_names), partitioning_flavor='hive',
+        basename_template=f'part-{part_id}-{{i}}.parquet',
+        existing_data_behavior='overwrite_or_ignore',
+        file_visitor=lambda f: written.append(os.path.relpath(os.path.dirname(f.path), path)),
+    )
+    return sorted(written)
@@ -0,0 +1,142 @@
+import pandas as pd
+import numpy as np
+import argparse
+import os
+
+import schema
+from create_csv import RAW_DIR
+from inflation_deflator import DB_INDEX, colums_to_load
+
+# --- Datos sintéticos con la forma de Comtrade ---
+# Genera raw_data/comtrade_<año>.csv con las columnas que lee create_csv.py y un índice de
+# precios compatible con inflation_deflator.py. Con la misma semilla y el mismo número de
+# filas el resultado es idéntico, para poder comparar mediciones entre versiones.
+# Solo los años que cubre el deflactor: los demás quedarían con RealValue NaN
+YEARS = [int(col) for col in colums_to_load if col.isdigit()]
+CPI_YEARS = range(1990, 2024)
+REPORTER = 'Colombia'
+
+# Bloque máximo en memoria al escribir: 10^8 filas se generan por partes
+CHUNK_ROWS = 1_000_000
+
+# Socios reales más importantes (además de EFTA y World) y países ficticios hasta completar
+MAIN_PARTNERS = ['USA', 'China', 'Mexico', 'Brazil', 'Germany', 'Spain', 'Japan', 'Peru', 'Ecuador',
+                 'Chile', 'India', 'France', 'Italy', 'Panama', 'Netherlands', 'Rep. of Korea']
+N_PARTNERS = 220
+
+# Países del índice de precios: código, nombre e inflación media anual (%)
+CPI_COUNTRIES = [('USA', 'United States', 2.5), ('COL', 'Colombia', 5.0), ('CHE', 'Switzerland', 0.8),
+                 ('NOR', 'Norway', 2.2), ('ISL', 'Iceland', 4.0)]
+
+
+def partners() -> list:
+    names = [schema.WORLD] + schema.EFTA + MAIN_PARTNERS
+    return names + [f'Country {i:03d}' for i in range(N_PARTNERS - len(names))]
+
+
+def hs_codes(seed: int = 0) -> tuple:
+    """
+    Jerarquía HS: 97 capítulos, de 5 a 20 partidas por capítulo y de 1 a 9 subpartidas
+    por partida (~1.200 partidas y ~6.000 subpartidas, como la nomenclatura real).
+    Devuelve (códigos, nivel de cada código).
+    """
+    rng = np.random.default_rng([seed, 0])
+    codes, levels = [], []
+    for chapter in range(1, 98):
+        codes.append(f'{chapter:02d}')
+        levels.append(2)
+        for heading in range(1, rng.integers(5, 21) + 1):
+            codes.append(f'{chapter:02d}{heading:02d}')
+            levels.append(4)
+            for subheading in range(1, rng.integers(1, 10) + 1):
+                codes.append(f'{chapter:02d}{heading:02d}{subheading:02d}')
+                levels.append(6)
+    return np.array(codes), np.array(levels)
+
+
+def _weights(n: int, exponent: float) -> np.ndarray:
+    # Distribución tipo Zipf: pocos elementos concentran la mayor parte del comercio
+    weights = 1 / np.arange(1, n + 1) ** exponent
+    return weights / weights.sum()
+
+
+def generate_chunk(rows: int, year: int, rng: np.random.Generator, codes: tuple, partner_names: list) -> pd.DataFrame:
+    hs, levels = codes
+    # Proporción de filas por nivel: 10 % capítulos, 30 % partidas, 59 % subpartidas y 1 % TOTAL
+    level = rng.choice([2, 4, 6, 0], size=rows, p=[0.10, 0.30, 0.59, 0.01])
+    hs_code = np.full(rows, 'TOTAL', dtype=object)
+    for value in schema.HS_LEVELS:
+        candidates = hs[levels == value]
+        mask = level == value
+        hs_code[mask] = candidates[rng.integers(0, len(candidates), mask.sum())]
+
+    partner = np.array(partner_names, dtype=object)[rng.choice(len(partner_names), size=rows, p=_weights(len(partner_names), 1.1))]
+    # Los valores crecen con los años y son mayores en los niveles más agregados
+    scale = np.select([level == 2, level == 4], [2.0, 1.0], default=0.0) + 0.03 * (year - YEARS[0])
+    fobvalue = np.round(rng.lognormal(mean=11 + scale, sigma=2.2, size=rows), 2)
+
+    return pd.DataFrame({
+        'typeCode': 'C',
+        'refPeriodId': year,
+        'reporterISO': REPORTER,
+        'flowCode': rng.choice(['Import', 'Export'], size=rows),
+        'partnerISO': partner,
+        'isOriginalClassification': hs_code,
+        'fobvalue': fobvalue,
+    })
+
+
+def generate_trade(rows: int, raw_dir: str = RAW_DIR, seed: int = 0, years=YEARS) -> list:
+    """
+    Escribe rows filas repartidas en un archivo por año. Devuelve la lista de archivos.
+    """
+    os.makedirs(raw_dir, exist_ok=True)
+    codes = hs_codes(seed)
+    partner_names = partners()
+    per_year = np.full(len(years), rows // len(years))
+    per_year[:rows % len(years)] += 1
+
+    archivos = []
+    for year, year_rows in zip(years, per_year):
+        archivo = f'{raw_dir}/comtrade_{year}.csv'
+        # Cada bloque tiene su propia semilla: el resultado no depende del orden de escritura
+        for chunk, start in enumerate(range(0, int(year_rows), CHUNK_ROWS)):
+            rng = np.random.default_rng([seed, year, chunk])
+            df = generate_chunk(min(CHUNK_ROWS, int(year_rows) - start), year, rng, codes, partner_names)
+            df.to_csv(archivo, index=False, encoding='latin1', mode='w' if chunk == 0 else 'a', header=chunk == 0)
+        archivos.append(archivo)
+    return archivos
+
+
+def generate_cpi(path: str = DB_INDEX, seed: int = 0) -> pd.DataFrame:
+    # Índice con base 100 en el primer año y una inflación anual que varía alrededor de la media
+    rng = np.random.default_rng([seed, 1])
+    rows = []
+    for code, name, inflation in CPI_COUNTRIES:
+        rates = np.clip(rng.normal(inflation, 1.0, len(CPI_YEARS) - 1), -1, None) / 100
+        index = 100 * np.cumprod(np.concatenate([[1.0], 1 + rates]))
+        rows.append({'Country Name': name, 'Country Code': code, **dict(zip(map(str, CPI_YEARS), index.round(3)))})
+
+    df_cpi = pd.DataFrame(rows)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    df_cpi.to_csv(path, index=False)
+    return df_cpi
+
+
+def generate(rows: int, out_dir: str = '.', seed: int = 0) -> None:
+    """
+    Crea out_dir/raw_data/ y out_dir/Data_Processed/consumer-price-index.csv.
+    """
+    archivos = generate_trade(rows, os.path.join(out_dir, RAW_DIR), seed)
+    generate_cpi(os.path.join(out_dir, DB_INDEX), seed)
+    print(f"Se generaron {rows} filas en {len(archivos)} archivos en '{os.path.join(out_dir, RAW_DIR)}'.")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Genera datos sintéticos con el formato de Comtrade.')
+    parser.add_argument('--rows', type=float, default=1e5, help='Número total de filas (p. ej. 1e6).')
+    parser.add_argument('--out', default='.', help='Directorio de salida.')
+    parser.add_argument('--seed', type=int, default=0, help='Semilla.')
+    args = parser.parse_args()
+
+    generate(int(args.rows), args.out, args.seed)
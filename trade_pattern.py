@@ -1,397 +1,244 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 
-# --- Cargar datos ---
-DB = 'Data_Processed/trade_deflated.csv'
-COLS = {
-    'Year': 'int32',
-    'Partner': 'str',
-    'Flow': 'str',
-    'HSCode': 'str',
-    'RealValue': 'float64'
-}
+import cube
+import dataset
+import query_engine
+import result_cache
+import schema
+import sharding
+from instrumentation import traced
 
-try:
-
-    df = pd.read_csv(DB, encoding='latin1',
-                    usecols=COLS.keys(),
-                    dtype=COLS
-                    )
-    print("\nEl DataFrame se cargó con éxito:\n")
+# --- Cargar datos ---
+# Los datos se leen en el primer uso (ver dataset.py), no al importar el módulo
+COLS = ['Year', 'Partner', 'Flow', 'HSCode', 'RealValue']
 
-except Exception as e:
-    print(f"Error reading CSV file: {e}")
+def load_data() -> pd.DataFrame:
+    return dataset.load(COLS)
 
 # --- Variables globales ---
-SECTORS = df[df['HSCode'].str.match(r'^\d{2}$')].reset_index(drop=True)
-INDUSTRIES = df[df['HSCode'].str.match(r'^\d{4}$')].reset_index(drop=True)
-PRODUCTS = df[df['HSCode'].str.match(r'^\d{6}$')].reset_index(drop=True)
-
-
-# 1. Sectores, industrias y productos más importantes para el Mundo
-# 1.1a Sectores de importación
-def world_sectors():
-    try:
-        efta_import_sectors = SECTORS.query('Flow == "Import" and Partner in ["Switzerland", "Norway", "Iceland"]')\
-            .groupby(['Year', 'HSCode'])['RealValue']\
-            .sum().reset_index()
-        
-        world_import_sectors = SECTORS.query('Flow == "Import"')\
-            .groupby(['Year', 'HSCode'])['RealValue']\
-            .sum().reset_index()
-
-        world_import_sectors = world_import_sectors\
-            .merge(efta_import_sectors, on=['Year', 'HSCode'],
-            how='left', suffixes=('', '_EFTA')).fillna(0)
-        
-        world_import_sectors['RealValue'] =\
-            world_import_sectors['RealValue'] - world_import_sectors['RealValue_EFTA']
-        
-        temp = []
-        for year, group in world_import_sectors.groupby('Year'):
-            # print(f"Año: {year}\nGrupo: {group}")
-            temp.append(group.nlargest(10, 'RealValue'))
-        world_import_sectors = pd.concat(temp).reset_index(drop=True)
+HS_LEVELS = {
+    'SECTORS': 2,
+    'INDUSTRIES': 4,
+    'PRODUCTS': 6,
+}
 
-    except Exception as e:
-        print(f"Error calculating world sectors, industries, products: {e}")
+def hs_frame(name: str) -> pd.DataFrame:
+    # Corte del índice por nivel HS, sin recorrer HSCode con regex
+    return dataset.hs_level(HS_LEVELS[name], COLS)
+
+def __getattr__(name):
+    # Compatibilidad con trade_pattern.df, SECTORS, INDUSTRIES y PRODUCTS
+    if name == 'df':
+        return load_data()
+    if name in HS_LEVELS:
+        return hs_frame(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+# --- Motor de rankings ---
+EFTA = schema.EFTA
+WORLD = schema.WORLD
+PARTNER_SETS = ('world', 'efta', 'main_partners')
+
+
+def top_n_per_group(df: pd.DataFrame, n: int, group_keys: list, value: str = 'RealValue') -> pd.DataFrame:
+    """
+    Las n filas con mayor value en cada grupo, con un solo ordenamiento estable
+    (mismo resultado y desempate que nlargest(n, value) grupo por grupo).
+    """
+    group_keys = list(group_keys)
+    ranked = df[df[value].notna()].sort_values(group_keys + [value],
+                                               ascending=[True] * len(group_keys) + [False],
+                                               kind='stable')
+    return ranked.groupby(group_keys, observed=True).head(n).reset_index(drop=True)
+
+
+def totals_frame(df: pd.DataFrame, partners: str, by: list) -> pd.DataFrame:
+    # Sumas de RealValue por by para el conjunto de socios (ver rank)
+    efta = df[df['Partner'].isin(EFTA)]
+    if partners == 'world':
+        # Todo el comercio por código, menos lo que corresponde a EFTA
+        totals = df.groupby(by, observed=True)['RealValue'].sum().reset_index()
+        efta_totals = efta.groupby(by, observed=True)['RealValue'].sum().reset_index()
+        totals = totals.merge(efta_totals, on=by, how='left', suffixes=('', '_EFTA'))
+        totals['RealValue_EFTA'] = totals['RealValue_EFTA'].fillna(0)
+        totals['RealValue'] = totals['RealValue'] - totals['RealValue_EFTA']
+    elif partners == 'efta':
+        totals = efta.groupby(by, observed=True)['RealValue'].sum().reset_index()
+    else:
+        main_partners = df[~df['Partner'].isin(EFTA + [WORLD])]
+        totals = main_partners.groupby(by, observed=True)['RealValue'].sum().reset_index()
+    return totals
+
+
+def rank_frame(df: pd.DataFrame, partners: str, n: int, by: list, group_keys: list) -> pd.DataFrame:
+    return top_n_per_group(totals_frame(df, partners, by), n, ['Flow'] + list(group_keys))
+
+
+def rank_sharded(df: pd.DataFrame, partners: str, n: int, by: list, group_keys: list, workers: int,
+                 key=None) -> pd.DataFrame:
+    """
+    rank en varios procesos, un fragmento por Year × Flow (ver sharding.py). Si los grupos del
+    ranking contienen Year, cada fragmento calcula su propio top n; si no, cada fragmento
+    devuelve sumas parciales que se suman antes de ordenar. El resultado es el mismo que rank.
+    key identifica a df para reutilizar sus fragmentos ya escritos.
+    """
+    group_keys = ['Flow'] + list(group_keys)
+    if set(sharding.SHARD_BY) <= set(group_keys):
+        parts = sharding.run_sharded(df, rank_frame, (partners, n, by, group_keys[1:]), workers=workers, key=key)
+        return pd.concat(parts).sort_values(group_keys, kind='stable').reset_index(drop=True)
+
+    parts = sharding.run_sharded(df, totals_frame, (partners, by), workers=workers, key=key)
+    totals = pd.concat(parts)
+    values = [col for col in totals.columns if col not in by]
+    totals = totals.groupby(by, observed=True)[values].sum().reset_index()
+    return top_n_per_group(totals, n, group_keys)
+
+
+@traced
+def rank(hs: str = 'SECTORS', partners: str = 'world', flow: str = None, n: int = 10,
+         keys: list = None, group_keys: list = ('Year',), source: str = None,
+         engine: str = None, workers: int = None) -> pd.DataFrame:
+    """
+    Top n de códigos HS por grupo (por defecto por año), para ambos flujos a la vez.
+
+    hs: 'SECTORS', 'INDUSTRIES' o 'PRODUCTS'.
+    partners: 'world' (todo el comercio menos EFTA), 'efta' o 'main_partners'
+        (todos menos EFTA y World).
+    flow: 'Import', 'Export' o None para ambos; el resultado trae la columna Flow.
+    keys: columnas de agregación; por defecto Year y HSCode (más Partner fuera de 'world').
+    source: 'rows' (datos fila a fila) o 'cube' (cubo de agregados, ver cube.py).
+    engine: 'pandas' o 'duckdb' (consulta perezosa sobre el archivo, ver query_engine.py).
+    workers: procesos para calcular por fragmentos Year × Flow (por defecto TRADE_WORKERS);
+        se usa con el motor pandas sobre las filas, sobre todo para PRODUCTS.
+    """
+    if partners not in PARTNER_SETS:
+        raise ValueError(f"Opción {partners} inválida. Opciones válidas: {PARTNER_SETS}")
+
+    if keys is None:
+        keys = ['Year', 'HSCode'] if partners == 'world' else ['Year', 'HSCode', 'Partner']
+    by = ['Flow'] + list(keys)
+
+    source = cube.resolve_source(source)
+    if source == 'cube' and partners == 'main_partners' and 'Partner' in keys:
+        # El cubo no guarda el detalle por socio fuera de EFTA y World
+        source = 'rows'
+
+    if query_engine.resolve_engine(engine) == 'duckdb':
+        if source == 'cube':
+            cube.refresh()
+        name = cube.CUBE if source == 'cube' else dataset.DATASET.name
+        return query_engine.top_n(name, HS_LEVELS[hs], by, ['Flow'] + list(group_keys), n, partners, flow)
+
+    df = cube.hs_level(HS_LEVELS[hs]) if source == 'cube' else hs_frame(hs)
+    if flow is not None:
+        df = df[df['Flow'] == flow]
+
+    workers = sharding.WORKERS if workers is None else workers
+    if workers > 1 and source == 'rows' and 'Year' in by:
+        # Los fragmentos de cada nivel HS (y flujo) se escriben una vez por versión de los datos
+        return rank_sharded(df, partners, n, by, group_keys, workers, key=('rank', hs, flow))
+    return rank_frame(df, partners, n, by, group_keys)
+
+
+def split_flows(df: pd.DataFrame) -> tuple:
+    # (importaciones, exportaciones) sin la columna Flow, como devuelven las funciones públicas
+    imports = df[df['Flow'] == 'Import'].drop(columns='Flow').reset_index(drop=True)
+    exports = df[df['Flow'] == 'Export'].drop(columns='Flow').reset_index(drop=True)
+    return imports, exports
 
-    # 1.1b Sectores de exportación
-    try:
-        efta_export_sectors = SECTORS.query('Flow == "Export" and Partner in ["Switzerland", "Norway", "Iceland"]')\
-            .groupby(['Year', 'HSCode'])['RealValue']\
-            .sum().reset_index()
-        
-        world_export_sectors = SECTORS.query('Flow == "Export"')\
-            .groupby(['Year', 'HSCode'])['RealValue']\
-            .sum().reset_index()
-
-        world_export_sectors = world_export_sectors\
-            .merge(efta_export_sectors, on=['Year', 'HSCode'],
-            how='left', suffixes=('', '_EFTA')).fillna(0)
-        
-        world_export_sectors['RealValue'] =\
-            world_export_sectors['RealValue'] - world_export_sectors['RealValue_EFTA']
-        
-        temp = []
-        for year, group in world_export_sectors.groupby('Year'):
-            # print(f"Año: {year}\nGrupo: {group}")
-            temp.append(group.nlargest(10, 'RealValue'))
-        world_export_sectors = pd.concat(temp).reset_index(drop=True)
-
-        return world_import_sectors, world_export_sectors
 
-    except Exception as e:
-        print(f"Error calculating world sectors, industries, products: {e}")
-
-# 1.2a Industrias de importación
-def world_industries():
+# 1. Sectores, industrias y productos más importantes para el Mundo
+# 1.1 Sectores de importación y exportación
+@traced
+@result_cache.cached
+def world_sectors(source: str = None, engine: str = None):
     try:
-        efta_import_industries = INDUSTRIES.query('Flow == "Import" and Partner in ["Switzerland", "Norway", "Iceland"]')\
-            .groupby(['Year', 'HSCode'])['RealValue']\
-            .sum().reset_index()
-        
-        world_import_industries = INDUSTRIES.query('Flow == "Import"')\
-            .groupby(['Year', 'HSCode'])['RealValue']\
-            .sum().reset_index()
-
-        world_import_industries = world_import_industries\
-            .merge(efta_import_industries, on=['Year', 'HSCode'],
-            how='left', suffixes=('', '_EFTA')).fillna(0)
-        
-        world_import_industries['RealValue'] =\
-            world_import_industries['RealValue'] - world_import_industries['RealValue_EFTA']
-        
-        temp = []
-        for year, group in world_import_industries.groupby('Year'):
-            # print(f"Año: {year}\nGrupo: {group}")
-            temp.append(group.nlargest(10, 'RealValue'))
-        world_import_industries = pd.concat(temp).reset_index(drop=True)
+        return split_flows(rank('SECTORS', 'world', source=source, engine=engine))
 
     except Exception as e:
         print(f"Error calculating world sectors, industries, products: {e}")
 
-    # 1.2b Industrias de exportación
+# 1.2 Industrias de importación y exportación
+@traced
+@result_cache.cached
+def world_industries(source: str = None, engine: str = None):
     try:
-        efta_export_industries = INDUSTRIES.query('Flow == "Export" and Partner in ["Switzerland", "Norway", "Iceland"]')\
-            .groupby(['Year', 'HSCode'])['RealValue']\
-            .sum().reset_index()
-        
-        world_export_industries = INDUSTRIES.query('Flow == "Export"')\
-            .groupby(['Year', 'HSCode'])['RealValue']\
-            .sum().reset_index()
-
-        world_export_industries = world_export_industries\
-            .merge(efta_export_industries, on=['Year', 'HSCode'],
-            how='left', suffixes=('', '_EFTA')).fillna(0)
-        
-        world_export_industries['RealValue'] =\
-            world_export_industries['RealValue'] - world_export_industries['RealValue_EFTA']
-        
-        temp = []
-        for year, group in world_export_industries.groupby('Year'):
-            # print(f"Año: {year}\nGrupo: {group}")
-            temp.append(group.nlargest(10, 'RealValue'))
-        world_export_industries = pd.concat(temp).reset_index(drop=True)
-
-        return world_import_industries, world_export_industries
+        return split_flows(rank('INDUSTRIES', 'world', source=source, engine=engine))
 
     except Exception as e:
         print(f"Error calculating world sectors, industries, products: {e}")
 
-# 1.3a Productos de importación
-def world_products():
+# 1.3 Productos de importación y exportación
+@traced
+@result_cache.cached
+def world_products(source: str = None, engine: str = None):
     try:
-        efta_import_products = PRODUCTS.query('Flow == "Import" and Partner in ["Switzerland", "Norway", "Iceland"]')\
-            .groupby(['Year', 'HSCode'])['RealValue']\
-            .sum().reset_index()
-        
-        world_import_products = PRODUCTS.query('Flow == "Import"')\
-            .groupby(['Year', 'HSCode'])['RealValue']\
-            .sum().reset_index()
-
-        world_import_products = world_import_products\
-            .merge(efta_import_products, on=['Year', 'HSCode'],
-            how='left', suffixes=('', '_EFTA')).fillna(0)
-        
-        world_import_products['RealValue'] =\
-            world_import_products['RealValue'] - world_import_products['RealValue_EFTA']
-        
-        temp = []
-        for year, group in world_import_products.groupby('Year'):
-            # print(f"Año: {year}\nGrupo: {group}")
-            temp.append(group.nlargest(10, 'RealValue'))
-        world_import_products = pd.concat(temp).reset_index(drop=True)
+        return split_flows(rank('PRODUCTS', 'world', source=source, engine=engine))
 
     except Exception as e:
         print(f"Error calculating world sectors, industries, products: {e}")
 
-    # 1.3b Productos de exportación
-    try:
-        efta_export_products = PRODUCTS.query('Flow == "Export" and Partner in ["Switzerland", "Norway", "Iceland"]')\
-            .groupby(['Year', 'HSCode'])['RealValue']\
-            .sum().reset_index()
-        
-        world_export_products = PRODUCTS.query('Flow == "Export"')\
-            .groupby(['Year', 'HSCode'])['RealValue']\
-            .sum().reset_index()
-
-        world_export_products = world_export_products\
-            .merge(efta_export_products, on=['Year', 'HSCode'],
-            how='left', suffixes=('', '_EFTA')).fillna(0)
-        
-        world_export_products['RealValue'] =\
-            world_export_products['RealValue'] - world_export_products['RealValue_EFTA']
-        
-        temp = []
-        for year, group in world_export_products.groupby('Year'):
-            # print(f"Año: {year}\nGrupo: {group}")
-            temp.append(group.nlargest(10, 'RealValue'))
-        world_export_products = pd.concat(temp).reset_index(drop=True)
-
-        return world_import_products, world_export_products
-
-    except Exception as e:
-        print(f"Error calculating world sectors, industries, products: {e}")
 
 # 2. Sectores, industrias y productos más importantes para EFTA
-# 2.1a Sectores de importación
-def efta_sectors():
-    try:
-        efta_import_sectors = SECTORS.query('Flow == "Import" and Partner in ["Switzerland", "Norway", "Iceland"]')\
-            .groupby(['Year', 'HSCode', 'Partner'])['RealValue']\
-            .sum().reset_index()
-        
-        efta_export_sectors = SECTORS.query('Flow == "Export" and Partner in ["Switzerland", "Norway", "Iceland"]')\
-            .groupby(['Year', 'HSCode', 'Partner'])['RealValue']\
-            .sum().reset_index()
-
-        temp = []
-        for year, group in efta_import_sectors.groupby('Year'):
-            # print(f"Año: {year}\nGrupo: {group}")
-            temp.append(group.nlargest(10, 'RealValue'))
-        efta_import_sectors = pd.concat(temp).reset_index(drop=True)
-
-    except Exception as e:
-        print(f"Error calculating world sectors, industries, products: {e}")
-
-    # 2.1b Sectores de exportación
-    try:
-        temp = []
-        for year, group in efta_export_sectors.groupby('Year'):
-            # print(f"Año: {year}\nGrupo: {group}")
-            temp.append(group.nlargest(10, 'RealValue'))
-        efta_export_sectors = pd.concat(temp).reset_index(drop=True)
-
-        return efta_import_sectors, efta_export_sectors
-
-    except Exception as e:
-        print(f"Error calculating world sectors, industries, products: {e}")
-
-# 2.2a Industrias de importación
-def efta_industries():
-    try:
-        efta_import_industries = INDUSTRIES.query('Flow == "Import" and Partner in ["Switzerland", "Norway", "Iceland"]')\
-            .groupby(['Year', 'HSCode', 'Partner'])['RealValue']\
-            .sum().reset_index()
-        
-        efta_export_industries = INDUSTRIES.query('Flow == "Export" and Partner in ["Switzerland", "Norway", "Iceland"]')\
-            .groupby(['Year', 'HSCode', 'Partner'])['RealValue']\
-            .sum().reset_index()
-
-        temp = []
-        for year, group in efta_import_industries.groupby('Year'):
-            # print(f"Año: {year}\nGrupo: {group}")
-            temp.append(group.nlargest(10, 'RealValue'))
-        efta_import_industries = pd.concat(temp).reset_index(drop=True)
-            
-    except Exception as e:
-        print(f"Error calculating world sectors, industries, products: {e}")
-
-    # 2.2b Industrias de exportación
+# 2.1 Sectores de importación y exportación
+@traced
+@result_cache.cached
+def efta_sectors(source: str = None, engine: str = None):
     try:
-        temp = []
-        for year, group in efta_export_industries.groupby('Year'):
-            # print(f"Año: {year}\nGrupo: {group}")
-            temp.append(group.nlargest(10, 'RealValue'))
-        efta_export_industries = pd.concat(temp).reset_index(drop=True)
-
-        return efta_import_industries, efta_export_industries
+        return split_flows(rank('SECTORS', 'efta', source=source, engine=engine))
 
     except Exception as e:
         print(f"Error calculating world sectors, industries, products: {e}")
 
-# 2.3a Productos de importación
-def efta_products():
+# 2.2 Industrias de importación y exportación
+@traced
+@result_cache.cached
+def efta_industries(source: str = None, engine: str = None):
     try:
-        efta_import_products = PRODUCTS.query('Flow == "Import" and Partner in ["Switzerland", "Norway", "Iceland"]')\
-            .groupby(['Year', 'HSCode', 'Partner'])['RealValue']\
-            .sum().reset_index()
-        
-        efta_export_products = PRODUCTS.query('Flow == "Export" and Partner in ["Switzerland", "Norway", "Iceland"]')\
-            .groupby(['Year', 'HSCode', 'Partner'])['RealValue']\
-            .sum().reset_index()
-
-        temp = []
-        for year, group in efta_import_products.groupby('Year'):
-            # print(f"Año: {year}\nGrupo: {group}")
-            temp.append(group.nlargest(10, 'RealValue'))
-        efta_import_products = pd.concat(temp).reset_index(drop=True)
+        return split_flows(rank('INDUSTRIES', 'efta', source=source, engine=engine))
 
     except Exception as e:
         print(f"Error calculating world sectors, industries, products: {e}")
 
-    # 2.3b Productos de exportación
+# 2.3 Productos de importación y exportación
+@traced
+@result_cache.cached
+def efta_products(source: str = None, engine: str = None):
     try:
-        temp = []
-        for year, group in efta_export_products.groupby('Year'):
-            # print(f"Año: {year}\nGrupo: {group}")
-            temp.append(group.nlargest(10, 'RealValue'))
-        efta_export_products = pd.concat(temp).reset_index(drop=True)
-
-        return efta_import_products, efta_export_products
+        return split_flows(rank('PRODUCTS', 'efta', source=source, engine=engine))
 
     except Exception as e:
         print(f"Error calculating world sectors, industries, products: {e}")
 
 
 # 3. Sectores, industrias y productos más importantes para principales socios
-# 3.1a Sectores de importación
-def main_partners_sectors():
+# 3.1 Sectores de importación y exportación
+@traced
+@result_cache.cached
+def main_partners_sectors(source: str = None, engine: str = None):
     try:
-        main_partners_import_sectors = SECTORS.query('Flow == "Import" and Partner not in ["Switzerland", "Norway", "Iceland", "World"]')\
-            .groupby(['Year', 'HSCode', 'Partner'])['RealValue']\
-            .sum().reset_index()
-        
-        main_partners_export_sectors = SECTORS.query('Flow == "Export" and Partner not in ["Switzerland", "Norway", "Iceland", "World"]')\
-            .groupby(['Year', 'HSCode', 'Partner'])['RealValue']\
-            .sum().reset_index()
-
-        temp = []
-        for year, group in main_partners_import_sectors.groupby('Year'):
-            # print(f"Año: {year}\nGrupo: {group}")
-            temp.append(group.nlargest(10, 'RealValue'))
-        main_partners_import_sectors = pd.concat(temp).reset_index(drop=True)
+        return split_flows(rank('SECTORS', 'main_partners', source=source, engine=engine))
 
     except Exception as e:
         print(f"Error calculating world sectors, industries, products: {e}")
 
-    # 3.1b Sectores de exportación
+# 3.2 Industrias de importación y exportación
+@traced
+@result_cache.cached
+def main_partners_industries(source: str = None, engine: str = None):
     try:
-        temp = []
-        for year, group in main_partners_export_sectors.groupby('Year'):
-            # print(f"Año: {year}\nGrupo: {group}")
-            temp.append(group.nlargest(10, 'RealValue'))
-        main_partners_export_sectors = pd.concat(temp).reset_index(drop=True)
-
-        return main_partners_import_sectors, main_partners_export_sectors
+        return split_flows(rank('INDUSTRIES', 'main_partners', source=source, engine=engine))
 
     except Exception as e:
         print(f"Error calculating world sectors, industries, products: {e}")
 
-# 3.2a Industrias de importación
-def main_partners_industries():
+# 3.3 Productos de importación y exportación
+@traced
+@result_cache.cached
+def main_partners_products(source: str = None, engine: str = None):
     try:
-        main_partners_import_industries = INDUSTRIES.query('Flow == "Import" and Partner not in ["Switzerland", "Norway", "Iceland", "World"]')\
-            .groupby(['Year', 'HSCode', 'Partner'])['RealValue']\
-            .sum().reset_index()
-        
-        main_partners_export_industries = INDUSTRIES.query('Flow == "Export" and Partner not in ["Switzerland", "Norway", "Iceland", "World"]')\
-            .groupby(['Year', 'HSCode', 'Partner'])['RealValue']\
-            .sum().reset_index()
-
-        temp = []
-        for year, group in main_partners_import_industries.groupby('Year'):
-            # print(f"Año: {year}\nGrupo: {group}")
-            temp.append(group.nlargest(10, 'RealValue'))
-        main_partners_import_industries = pd.concat(temp).reset_index(drop=True)
+        return split_flows(rank('PRODUCTS', 'main_partners', source=source, engine=engine))
 
     except Exception as e:
         print(f"Error calculating world sectors, industries, products: {e}")
-
-    # 3.2b Industrias de exportación
-    try:
-        temp = []
-        for year, group in main_partners_export_industries.groupby('Year'):
-            # print(f"Año: {year}\nGrupo: {group}")
-            temp.append(group.nlargest(10, 'RealValue'))
-        main_partners_export_industries = pd.concat(temp).reset_index(drop=True)
-
-        return main_partners_import_industries, main_partners_export_industries
-
-    except Exception as e:
-        print(f"Error calculating world sectors, industries, products: {e}")
-
-# 3.3a Productos de importación
-def main_partners_products():
-    try:
-        main_partners_import_products = PRODUCTS.query('Flow == "Import" and Partner not in ["Switzerland", "Norway", "Iceland", "World"]')\
-            .groupby(['Year', 'HSCode', 'Partner'])['RealValue']\
-            .sum().reset_index()
-        
-        main_partners_export_products = PRODUCTS.query('Flow == "Export" and Partner not in ["Switzerland", "Norway", "Iceland", "World"]')\
-            .groupby(['Year', 'HSCode', 'Partner'])['RealValue']\
-            .sum().reset_index()
-
-        temp = []
-        for year, group in main_partners_import_products.groupby('Year'):
-            # print(f"Año: {year}\nGrupo: {group}")
-            temp.append(group.nlargest(10, 'RealValue'))
-        main_partners_import_products = pd.concat(temp).reset_index(drop=True)
-
-    except Exception as e:
-        print(f"Error calculating world sectors, industries, products: {e}")
-
-    # 3.3b Productos de exportación
-    try:
-        temp = []
-        for year, group in main_partners_export_products.groupby('Year'):
-            # print(f"Año: {year}\nGrupo: {group}")
-            temp.append(group.nlargest(10, 'RealValue'))
-        main_partners_export_products = pd.concat(temp).reset_index(drop=True)
-
-        return main_partners_import_products, main_partners_export_products
-
-    except Exception as e:
-        print(f"Error calculating world sectors, industries, products: {e}")
\ No newline at end of file
@@ -1,43 +1,85 @@
 import pandas as pd
 import os
 
+import cube
+import dataset
+import query_engine
+import result_cache
+import schema
+from instrumentation import traced
 
-# --- Cargar datos ---
-try:
-
-    DB = 'Data_Processed/trade_deflated.csv'
-    COLS = ['Year', 'HSCode', 'Partner', 'RealValue', 'Flow']
-
-    df = pd.read_csv(DB, encoding='latin1', usecols=COLS, dtype={
-        'Year': 'int32',
-        'HSCode': 'str',
-        'Flow': 'str',
-        'Partner': 'str',
-        'RealValue': 'float64',
-    })
 
-    print("\nEl DataFrame se cargó con éxito:\n")
-
-except Exception as e:
-    print(f"Error reading CSV file: {e}")
+# --- Cargar datos ---
+# Los datos se leen en el primer uso (ver dataset.py), no al importar el módulo
+COLS = ['Year', 'HSCode', 'Partner', 'RealValue', 'Flow']
+
+def load_data() -> pd.DataFrame:
+    return dataset.load(COLS)
+
+def trade_flow() -> pd.DataFrame:
+    # Capítulos HS de 2 dígitos: un corte del índice por nivel HS
+    return dataset.hs_level(2, COLS)
+
+def __getattr__(name):
+    # Compatibilidad con trade_volume.df y trade_volume.DF_TRADE_FLOW
+    if name == 'df':
+        return load_data()
+    if name == 'DF_TRADE_FLOW':
+        return trade_flow()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# --- Agregación compartida ---
+@traced
+def aggregate_flows(source: str = None, engine: str = None) -> pd.DataFrame:
+    """
+    Sumas de RealValue por Flow × Year × Partner en un solo groupby, con la columna
+    PartnerGroup (EFTA, MainPartner o World). Todas las funciones públicas leen de aquí.
+    Con source='cube' se suman las filas del cubo de agregados en vez de los datos fila a fila;
+    con engine='duckdb' la suma es una consulta de DuckDB sobre el archivo (ver query_engine.py).
+    """
+    if query_engine.resolve_engine(engine) == 'duckdb':
+        source = cube.resolve_source(source)
+        if source == 'cube':
+            cube.refresh()
+        name = cube.CUBE if source == 'cube' else dataset.DATASET.name
+        totals = query_engine.aggregate(name, 2, ['Flow', 'Year', 'Partner'])
+        totals['PartnerGroup'] = schema.partner_group(totals['Partner'])
+        return totals
+
+    if cube.resolve_source(source) == 'cube':
+        return cube.query(['Flow', 'Year', 'Partner', 'PartnerGroup'],
+                          filters=[('HSLevel', '==', 2)], measures=['RealValue'])
+
+    def build():
+        totals = trade_flow().groupby(['Flow', 'Year', 'Partner'], observed=True)['RealValue'].sum().reset_index()
+        totals['PartnerGroup'] = schema.partner_group(totals['Partner'])
+        return totals
+    return dataset.DATASET.memo(('trade_volume', 'aggregate_flows'), build)
+
+def select_flows(group: str, by_partner: bool = True, source: str = None, engine: str = None) -> tuple:
+    # (importaciones, exportaciones) de un grupo de socios, por año y socio o solo por año
+    if group == 'MainPartner' and by_partner:
+        # El cubo no guarda el detalle por socio fuera de EFTA y World
+        source = 'rows'
+    totals = aggregate_flows(source, engine)
+    totals = totals[totals['PartnerGroup'] == group]
+    flows = []
+    for flow in ['Import', 'Export']:
+        selected = totals[totals['Flow'] == flow]
+        if by_partner:
+            selected = selected[['Year', 'Partner', 'RealValue']].reset_index(drop=True)
+        else:
+            selected = selected.groupby('Year', observed=True)['RealValue'].sum().reset_index()
+        flows.append(selected)
+    return tuple(flows)
 
-DF_TRADE_FLOW = df[df['HSCode'].str.match(r'^\d{2}$')]
 
 # --- Flujo comercial con EFTA ---
-def efta_trade_volume() -> pd.DataFrame:
+@traced
+@result_cache.cached
+def efta_trade_volume(source: str = None, engine: str = None) -> pd.DataFrame:
     try:
-
-        efta_imports = DF_TRADE_FLOW\
-            .query(\
-            'Partner in ["Switzerland", "Norway", "Iceland"] and Flow == "Import"'\
-            ).reset_index()
-        efta_imports = efta_imports.groupby(['Year', 'Partner'])['RealValue'].sum().reset_index()
-        
-        efta_exports = DF_TRADE_FLOW\
-            .query(\
-            'Partner in ["Switzerland", "Norway", "Iceland"] and Flow == "Export"'\
-            ).reset_index()
-        efta_exports = efta_exports.groupby(['Year', 'Partner'])['RealValue'].sum().reset_index()
+        efta_imports, efta_exports = select_flows('EFTA', source=source, engine=engine)
 
         return efta_imports, efta_exports
 
@@ -46,20 +88,11 @@ def efta_trade_volume() -> pd.DataFrame:
 
 
 # --- Flujo comercial con principales socios ---
-def main_partners_trade_volume() -> pd.DataFrame:
+@traced
+@result_cache.cached
+def main_partners_trade_volume(source: str = None, engine: str = None) -> pd.DataFrame:
     try:
-
-        main_partners_imports = DF_TRADE_FLOW\
-            .query(\
-            'Partner not in ["Switzerland", "Norway", "Iceland", "World"] and Flow == "Import"'\
-            ).reset_index()
-        main_partners_imports = main_partners_imports.groupby(['Year', 'Partner'])['RealValue'].sum().reset_index()
-        
-        main_partners_exports = DF_TRADE_FLOW\
-            .query(\
-            'Partner not in ["Switzerland", "Norway", "Iceland", "World"] and Flow == "Export"'\
-            ).reset_index()
-        main_partners_exports = main_partners_exports.groupby(['Year', 'Partner'])['RealValue'].sum().reset_index()
+        main_partners_imports, main_partners_exports = select_flows('MainPartner', source=source, engine=engine)
 
         return main_partners_imports, main_partners_exports
         
@@ -68,24 +101,14 @@ def main_partners_trade_volume() -> pd.DataFrame:
 
 
 # --- Flujo comercial con el mundo ---
-def world_trade_volume() -> pd.DataFrame:
+@traced
+@result_cache.cached
+def world_trade_volume(source: str = None, engine: str = None) -> pd.DataFrame:
     try:
-        efta_imports, efta_exports = efta_trade_volume()
-        world_imports = DF_TRADE_FLOW\
-        .query(\
-        'Partner == "World" and Flow == "Import"'\
-        ).reset_index()
-        world_imports = world_imports.groupby('Year')['RealValue'].sum().reset_index()
-
-        world_exports = DF_TRADE_FLOW\
-        .query(\
-        'Partner == "World" and Flow == "Export"'\
-        ).reset_index()
-        world_exports = world_exports.groupby('Year')['RealValue'].sum().reset_index()
+        world_imports, world_exports = select_flows('World', by_partner=False, source=source, engine=engine)
 
         # Restar los flujos de EFTA
-        efta_imports_grouped = efta_imports.groupby('Year')['RealValue'].sum().reset_index()
-        efta_exports_grouped = efta_exports.groupby('Year')['RealValue'].sum().reset_index()
+        efta_imports_grouped, efta_exports_grouped = select_flows('EFTA', by_partner=False, source=source, engine=engine)
 
         world_imports = world_imports.merge(efta_imports_grouped, on='Year', how='left', suffixes=('', '_EFTA'))
         world_imports['RealValue'] = world_imports['RealValue'] - world_imports['RealValue_EFTA']
@@ -103,14 +126,16 @@ def world_trade_volume() -> pd.DataFrame:
 
 
 # --- Comparación relativa con el comercio mundial ---
-def relative_world_trade_volume() -> pd.DataFrame:
+@traced
+@result_cache.cached
+def relative_world_trade_volume(source: str = None, engine: str = None) -> pd.DataFrame:
     try:
-        efta_imports, efta_exports = efta_trade_volume()
-        main_partners_imports, main_partners_exports = main_partners_trade_volume()
+        efta_imports, efta_exports = efta_trade_volume(source, engine)
+        main_partners_imports, main_partners_exports = main_partners_trade_volume(source, engine)
         """
         Cuanto representan las importaciones/exportaciones de EFTA y sus socios principales, con relación al Mundo.
         """ 
-        world_imports, world_exports = world_trade_volume()
+        world_imports, world_exports = world_trade_volume(source, engine)
         # Unir los DataFrames de EFTA con los de importaciones y exportaciones mundiales
         relative_world_imports = world_imports.merge(efta_imports, on='Year', how='left', suffixes=('', '_EFTA'))
         relative_world_imports['EFTAParticipation'] = relative_world_imports['RealValue_EFTA'] / relative_world_imports['RealValue']
@@ -132,10 +157,12 @@ def relative_world_trade_volume() -> pd.DataFrame:
 
 
 # --- Comparación relativa EFTA/Socios principales ---
-def efta_relative_trade_volume() -> pd.DataFrame:
+@traced
+@result_cache.cached
+def efta_relative_trade_volume(source: str = None, engine: str = None) -> pd.DataFrame:
     try:
-        efta_imports, efta_exports = efta_trade_volume()
-        main_partners_imports, main_partners_exports = main_partners_trade_volume()
+        efta_imports, efta_exports = efta_trade_volume(source, engine)
+        main_partners_imports, main_partners_exports = main_partners_trade_volume(source, engine)
         """
         Por cada unidad de dolar importada/exportada de EFTA, ¿cuánto se importa/exporta de los principales socios?
         """
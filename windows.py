@@ -0,0 +1,114 @@
+import pandas as pd
+import numpy as np
+
+import dataset
+
+# --- Índice de sumas acumuladas por año ---
+# Para cada (Flow, Partner, HSCode) se guarda la suma acumulada de RealValue por año:
+# el total de cualquier ventana [y0, y1] es la diferencia de dos posiciones del arreglo,
+# sin filtrar ni agrupar las filas otra vez. Pensado para barridos de ventanas alrededor
+# de la entrada en vigor del acuerdo (estudios de eventos).
+KEYS = ['Flow', 'Partner', 'HSCode']
+
+
+class YearIndex:
+    """
+    prefix[k, i] = suma de value de la clave k en los años first .. first + i - 1.
+    counts[i] = años con datos (en cualquier clave) entre first y first + i - 1: los datos
+    pueden no ser anuales (p. ej. solo años pares). En un año con datos, una clave sin
+    comercio cuenta como 0.
+    """
+
+    def __init__(self, keys: pd.MultiIndex, first: int, prefix: np.ndarray, counts: np.ndarray):
+        self.keys = keys
+        self.first = first
+        self.prefix = prefix
+        self.counts = counts
+
+    @classmethod
+    def build(cls, df: pd.DataFrame, value: str = 'RealValue', keys: list = KEYS) -> 'YearIndex':
+        totals = df.groupby(list(keys) + ['Year'], observed=True)[value].sum()
+        years = totals.index.get_level_values('Year').to_numpy().astype('int64')
+        first = int(years.min())
+
+        key_index = totals.index.droplevel('Year')
+        unique_keys = key_index.unique()
+        rows = unique_keys.get_indexer(key_index)
+
+        prefix = np.zeros((len(unique_keys), int(years.max()) - first + 2))
+        prefix[rows, years - first + 1] = totals.to_numpy()
+        np.cumsum(prefix, axis=1, out=prefix)
+
+        counts = np.zeros(prefix.shape[1], dtype='int64')
+        counts[np.unique(years) - first + 1] = 1
+        return cls(unique_keys, first, prefix, np.cumsum(counts))
+
+    @property
+    def years(self) -> range:
+        return range(self.first, self.first + self.prefix.shape[1] - 1)
+
+    def rows(self, **filters) -> np.ndarray:
+        # Posiciones de las claves que cumplen filters, p. ej. rows(Flow='Import', Partner='Norway')
+        mask = np.ones(len(self.keys), dtype=bool)
+        for name, values in filters.items():
+            values = [values] if np.isscalar(values) else list(values)
+            mask &= self.keys.get_level_values(name).isin(values)
+        return np.flatnonzero(mask)
+
+    def _bounds(self, y0, y1) -> tuple:
+        # Posiciones del arreglo acumulado para [y0, y1], recortadas a los años disponibles
+        n_years = self.prefix.shape[1] - 1
+        start = np.clip(np.asarray(y0, dtype='int64') - self.first, 0, n_years)
+        stop = np.clip(np.asarray(y1, dtype='int64') - self.first + 1, 0, n_years)
+        return start, np.maximum(stop, start)
+
+    def total(self, y0: int, y1: int, rows: np.ndarray = None) -> np.ndarray:
+        prefix = self.prefix if rows is None else self.prefix[rows]
+        start, stop = self._bounds(y0, y1)
+        return prefix[:, stop] - prefix[:, start]
+
+    def mean(self, y0: int, y1: int, rows: np.ndarray = None) -> np.ndarray:
+        # Promedio por año con datos dentro de la ventana (NaN si la ventana no tiene años con datos)
+        start, stop = self._bounds(y0, y1)
+        n_years = self.counts[stop] - self.counts[start]
+        return self.total(y0, y1, rows) / np.where(n_years > 0, n_years, np.nan)
+
+    def sweep(self, starts, ends, rows: np.ndarray = None, how: str = 'total') -> np.ndarray:
+        """
+        Evalúa muchas ventanas a la vez: devuelve un arreglo (claves × ventanas)
+        con el total (o el promedio por año con datos si how='mean') de cada ventana [starts[j], ends[j]].
+        """
+        if how not in ('total', 'mean'):
+            raise ValueError(f"Opción {how} inválida. Opciones válidas: total, mean")
+        return getattr(self, how)(np.asarray(starts), np.asarray(ends), rows)
+
+    def event(self, anchor: int, before: int, after: int, rows: np.ndarray = None) -> pd.DataFrame:
+        """
+        Promedio por año con datos antes ([anchor - before, anchor - 1]) y después
+        ([anchor, anchor + after - 1]) de un año de referencia, con el cambio porcentual.
+        """
+        keys = self.keys if rows is None else self.keys[rows]
+        pre = self.mean(anchor - before, anchor - 1, rows)
+        post = self.mean(anchor, anchor + after - 1, rows)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            change = (post / pre - 1) * 100
+        return pd.DataFrame({'Before': pre, 'After': post, 'Change': change}, index=keys).reset_index()
+
+    def frame(self, y0: int, y1: int, rows: np.ndarray = None) -> pd.DataFrame:
+        # Total y promedio por año con datos de la ventana para cada clave, como DataFrame
+        keys = self.keys if rows is None else self.keys[rows]
+        return pd.DataFrame({'Total': self.total(y0, y1, rows), 'Mean': self.mean(y0, y1, rows)},
+                            index=keys).reset_index()
+
+
+def year_index(level: int = None, value: str = 'RealValue') -> YearIndex:
+    """
+    Índice de sumas acumuladas del dataset compartido, para un nivel HS (2, 4 o 6)
+    o para todos los códigos si level es None. Se construye una vez por proceso.
+    """
+    columns = KEYS + ['Year', value]
+
+    def build():
+        df = dataset.load(columns) if level is None else dataset.hs_level(level, columns)
+        return YearIndex.build(df, value)
+    return dataset.DATASET.memo(('windows', level, value), build)